@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark account deletion strategies against the configured Supabase project.
+
+Seeds throwaway users with rows in every per-user table, then deletes them with:
+  - sequential:  one awaited delete per table (the old delete_account)
+  - concurrent:  db.account_delete_concurrent (parallel deletes, no transaction)
+  - rpc:         delete_user_account RPC (single transaction)
+
+Usage (from backend/, with SUPABASE_URL / SUPABASE_SERVICE_KEY set):
+    python bench_account_delete.py [users_per_strategy]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).parent / '.env')
+
+import db as db_layer
+
+
+async def seed_user() -> str:
+    """Create a bench user with one row in each table"""
+    user_id = f"bench_{uuid.uuid4().hex[:12]}"
+    now = datetime.now(timezone.utc)
+    await db_layer.user_insert({
+        "user_id": user_id,
+        "email": f"{user_id}@bench.invalid",
+        "name": "Bench User",
+        "created_at": now,
+    })
+    await asyncio.gather(
+        db_layer.session_insert({
+            "user_id": user_id,
+            "session_token": f"bench_{uuid.uuid4().hex}",
+            "expires_at": now + timedelta(days=1),
+            "created_at": now,
+        }),
+        db_layer.creator_universe_insert({"user_id": user_id, "updated_at": now}),
+        db_layer.analysis_upsert(user_id, "1", {"id": "1", "title": "bench"}),
+        db_layer.schedule_insert({"user_id": user_id, "schedule": {}, "updated_at": now}),
+        db_layer.story_finder_upsert(user_id, [{"id": "1"}], now),
+        db_layer.content_tips_insert({"user_id": user_id, "tip_id": "1", "quiz_completed": True}),
+        db_layer.batching_upsert(user_id, "1", {"id": "1", "title": "bench"}),
+        db_layer.mission_upsert({"user_id": user_id, "date": now.strftime("%Y-%m-%d"), "completed": True, "created_at": now}),
+        db_layer.sos_insert({"user_id": user_id, "issue_type": "bench", "completed_at": now}),
+    )
+    return user_id
+
+
+async def delete_sequential(user_id: str):
+    await db_layer.session_delete_by_user(user_id)
+    await db_layer.creator_universe_delete_by_user(user_id)
+    await db_layer.analysis_delete_by_user(user_id)
+    await db_layer.schedule_delete_by_user(user_id)
+    await db_layer.story_finder_delete_by_user(user_id)
+    await db_layer.content_tips_delete_by_user(user_id)
+    await db_layer.batching_delete_by_user(user_id)
+    await db_layer.mission_delete_by_user(user_id)
+    await db_layer.sos_delete_by_user(user_id)
+    await db_layer.user_delete(user_id)
+
+
+async def delete_rpc(user_id: str):
+    await db_layer._db().rpc("delete_user_account", {"p_user_id": user_id})
+
+
+STRATEGIES = {
+    "sequential": delete_sequential,
+    "concurrent": db_layer.account_delete_concurrent,
+    "rpc": delete_rpc,
+}
+
+
+async def teardown(user_ids: list):
+    """Drop the deletion records the account deletes left for the bench users"""
+    for i in range(0, len(user_ids), 100):
+        await db_layer._db().delete("deleted_accounts", filters=[("user_id", "in", user_ids[i:i + 100])])
+
+
+async def main(n: int):
+    print(f"Seeding {n} users per strategy...")
+    print(f"{'strategy':<12} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    seeded = []
+    try:
+        for name, delete in STRATEGIES.items():
+            user_ids = [await seed_user() for _ in range(n)]
+            seeded.extend(user_ids)
+            timings = []
+            for user_id in user_ids:
+                start = time.perf_counter()
+                await delete(user_id)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            print(f"{name:<12} {statistics.median(timings):>9.1f} {p95:>9.1f} {timings[-1]:>9.1f}")
+    finally:
+        await teardown(seeded)
+        await db_layer.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10))
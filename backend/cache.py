@@ -0,0 +1,175 @@
+"""
+In-process caches for Universe backend.
+Bounded LRU with per-entry TTL and tag-based invalidation.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after ttl seconds.
+
+    Entries can carry tags (e.g. "user:{id}") so every entry that belongs to
+    a user can be evicted at once when that user's data changes. A value
+    read from the database should be stored through loading(), so a read
+    that raced an invalidation of its tags does not put stale data back.
+    While enabled() is false every get misses and every set is dropped,
+    e.g. for caches that are only safe while writes are being heard.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 60.0, enabled: Optional[Callable[[], bool]] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self._data: "OrderedDict[Hashable, Tuple[float, Any, Tuple[str, ...]]]" = OrderedDict()
+        self._tags: Dict[str, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.skipped_stores = 0
+        self.bypassed = 0
+        # Invalidation sequence numbers, remembered only while loads are in flight
+        self._seq = 0
+        self._load_starts: Counter = Counter()
+        self._invalidated_at: Dict[str, int] = {}
+        self._cleared_at = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if not self.is_enabled():
+            self.bypassed += 1
+            return None
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires, value, _ = item
+            if expires < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[str] = (), ttl: Optional[float] = None):
+        if not self.is_enabled():
+            return
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            tags = tuple(tags)
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.max_entries:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def is_enabled(self) -> bool:
+        return self.enabled is None or self.enabled()
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+                self.invalidations += 1
+
+    def invalidate_tag(self, tag: str):
+        """Evict every entry carrying tag."""
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+                self.invalidations += 1
+            if self._load_starts:
+                self._seq += 1
+                self._invalidated_at[tag] = self._seq
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+            if self._load_starts:
+                self._seq += 1
+                self._cleared_at = self._seq
+
+    def loading(self) -> "Load":
+        """Context for a database read whose result may be cached (see Load)."""
+        return Load(self)
+
+    def _begin_load(self) -> int:
+        with self._lock:
+            self._load_starts[self._seq] += 1
+            return self._seq
+
+    def _end_load(self, start: int):
+        with self._lock:
+            self._load_starts[start] -= 1
+            if not self._load_starts[start]:
+                del self._load_starts[start]
+            if not self._load_starts:
+                self._invalidated_at.clear()
+            elif len(self._invalidated_at) > 1000:
+                oldest = min(self._load_starts)
+                self._invalidated_at = {t: s for t, s in self._invalidated_at.items() if s > oldest}
+
+    def _set_if_fresh(self, start: int, key: Hashable, value: Any, tags: Tuple[str, ...], ttl: Optional[float]):
+        with self._lock:
+            stale = self._cleared_at > start or any(self._invalidated_at.get(t, 0) > start for t in tags)
+            if stale:
+                self.skipped_stores += 1
+                return
+        self.set(key, value, tags=tags, ttl=ttl)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.is_enabled(),
+            "size": len(self._data),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "skipped_stores": self.skipped_stores,
+            "bypassed": self.bypassed,
+        }
+
+    def _remove(self, key: Hashable):
+        _, _, tags = self._data.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class Load:
+    """One read-then-cache: with cache.loading() as load: ...; load.set(...).
+
+    set() is skipped when any of its tags was invalidated (or the cache was
+    cleared) after the block was entered, i.e. while the read was running.
+    """
+
+    def __init__(self, cache: TTLCache):
+        self.cache = cache
+        self.start = 0
+
+    def __enter__(self) -> "Load":
+        self.start = self.cache._begin_load()
+        return self
+
+    def __exit__(self, *exc):
+        self.cache._end_load(self.start)
+        return False
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[str] = (), ttl: Optional[float] = None):
+        self.cache._set_if_fresh(self.start, key, value, tuple(tags), ttl)
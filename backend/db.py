@@ -1,13 +1,28 @@
 """
 Supabase database layer for Universe backend.
-Wraps sync Supabase client with async helpers.
+Queries go through a small transport with two implementations: native async
+PostgREST over a pooled httpx client (default), or the sync Supabase client
+in a dedicated, bounded thread pool (DB_CLIENT=sync).
 """
 import os
 import asyncio
+import base64
+import functools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from supabase import create_client, Client
-from typing import Any, Optional, List
+from typing import Any, Dict, Optional, List, Sequence, Tuple
 from datetime import datetime, timezone
 
+from cache import TTLCache
+from invalidation import ALL_TABLES, bus
+from singleflight import SingleFlight
+from write_buffer import WriteBuffer
+from pgrest import AsyncPostgREST, Filter, Order, filter_value, filters_from, quote_value
+from postgrest.exceptions import APIError
+
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_SERVICE_KEY = os.environ.get("SUPABASE_SERVICE_KEY")
 
@@ -17,8 +32,61 @@ if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
         "Get them from Supabase project Settings > API."
     )
 
+DB_CLIENT = os.environ.get("DB_CLIENT", "async")
+DB_POOL_MAX_CONNECTIONS = int(os.environ.get("DB_POOL_MAX_CONNECTIONS", "100"))
+DB_POOL_MAX_KEEPALIVE = int(os.environ.get("DB_POOL_MAX_KEEPALIVE", "20"))
+DB_POOL_KEEPALIVE_EXPIRY = float(os.environ.get("DB_POOL_KEEPALIVE_EXPIRY", "30"))
+DB_TIMEOUT = float(os.environ.get("DB_TIMEOUT", "10"))
+DB_HTTP2 = os.environ.get("DB_HTTP2", "1") == "1"
+
+# Blocking calls (DB_CLIENT=sync) get their own bounded executor
+DB_EXECUTOR_WORKERS = int(os.environ.get("DB_EXECUTOR_WORKERS", "16"))
+DB_EXECUTOR_MAX_QUEUE = int(os.environ.get("DB_EXECUTOR_MAX_QUEUE", "200"))
+
+# Autosave upserts to analysis_entries / batching_scripts are buffered for this
+# many ms and flushed as batched multi-row upserts; 0 writes through immediately
+WRITE_COALESCE_MS = float(os.environ.get("WRITE_COALESCE_MS", "0"))
+
+# Identical concurrent calls to the reads marked @coalesced share one query
+DB_COALESCE_READS = os.environ.get("DB_COALESCE_READS", "1") == "1"
+
 _sb: Optional[Client] = None
 
+# Resolved (session, user) pairs keyed by session token, used by get_current_user.
+# Every write to a user's row or sessions (in any worker, via the invalidation
+# bus) evicts that user's entries. Only used while the bus is listening on
+# Postgres: the app also writes straight to Supabase, and the in-process bus
+# alone never hears those writes.
+auth_cache = TTLCache(
+    max_entries=int(os.environ.get("AUTH_CACHE_MAX_ENTRIES", "10000")),
+    ttl=float(os.environ.get("AUTH_CACHE_TTL_SECONDS", "60")),
+    enabled=lambda: bus.connected,
+)
+
+
+def user_cache_tag(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def _changed(table: str, user_id: str):
+    """Announce a write to the user's rows in table on the invalidation bus."""
+    bus.publish(table, user_id)
+
+
+def invalidate_user(user_id: str):
+    """Drop cached sessions/user docs for user_id."""
+    _changed("users", user_id)
+
+
+def _evict_auth(table: str, user_id: Optional[str]):
+    if user_id is None:
+        auth_cache.clear()
+    elif table in ("users", "user_sessions", ALL_TABLES):
+        auth_cache.invalidate_tag(user_cache_tag(user_id))
+
+
+bus.subscribe(_evict_auth)
+
 
 def _sb_client() -> Client:
     global _sb
@@ -27,9 +95,217 @@ def _sb_client() -> Client:
     return _sb
 
 
-async def _run(fn):
-    """Run sync Supabase call in thread pool. fn is a callable with no args."""
-    return await asyncio.to_thread(fn)
+class DBOverloaded(Exception):
+    """Too many blocking db calls are already waiting for the executor."""
+
+
+_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db")
+_executor_lock = threading.Lock()
+_executor_pending = 0
+_executor_rejected = 0
+# op -> [calls, queue_wait_total, queue_wait_max, exec_total, exec_max] (seconds)
+_executor_timings: Dict[str, List[float]] = {}
+
+
+def _record_timing(op: str, queue_wait: float, exec_time: float):
+    with _executor_lock:
+        t = _executor_timings.setdefault(op, [0, 0.0, 0.0, 0.0, 0.0])
+        t[0] += 1
+        t[1] += queue_wait
+        t[2] = max(t[2], queue_wait)
+        t[3] += exec_time
+        t[4] = max(t[4], exec_time)
+
+
+def _release_slot(_):
+    global _executor_pending
+    with _executor_lock:
+        _executor_pending -= 1
+
+
+async def _run(fn, op: str = "db"):
+    """Run sync Supabase call in the db thread pool. fn is a callable with no args.
+
+    Fails fast with DBOverloaded once DB_EXECUTOR_MAX_QUEUE calls are queued,
+    and records queue wait vs execution time under op.
+    """
+    global _executor_pending, _executor_rejected
+    with _executor_lock:
+        if _executor_pending - DB_EXECUTOR_WORKERS >= DB_EXECUTOR_MAX_QUEUE:
+            _executor_rejected += 1
+            raise DBOverloaded(f"db executor queue full ({DB_EXECUTOR_MAX_QUEUE} waiting)")
+        _executor_pending += 1
+    submitted = time.perf_counter()
+
+    def call():
+        started = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            _record_timing(op, started - submitted, time.perf_counter() - started)
+
+    future = _executor.submit(call)
+    future.add_done_callback(_release_slot)
+    return await asyncio.wrap_future(future)
+
+
+def executor_stats() -> dict:
+    """Executor saturation and per-op queue wait vs execution time (ms)."""
+    with _executor_lock:
+        ops = {
+            op: {
+                "calls": int(t[0]),
+                "queue_wait_ms_avg": round(t[1] / t[0] * 1000, 3),
+                "queue_wait_ms_max": round(t[2] * 1000, 3),
+                "exec_ms_avg": round(t[3] / t[0] * 1000, 3),
+                "exec_ms_max": round(t[4] * 1000, 3),
+            }
+            for op, t in _executor_timings.items()
+        }
+        return {
+            "workers": DB_EXECUTOR_WORKERS,
+            "max_queue": DB_EXECUTOR_MAX_QUEUE,
+            "in_flight": _executor_pending,
+            "queued": max(0, _executor_pending - DB_EXECUTOR_WORKERS),
+            "rejected": _executor_rejected,
+            "ops": ops,
+        }
+
+
+def _apply_filters(q, eq: Optional[Dict[str, Any]], filters: Sequence[Filter]):
+    for col, op, val in filters_from(eq, filters):
+        q = q.filter(col, op, filter_value(val, op))
+    return q
+
+
+class SyncSupabase:
+    """Same interface as pgrest.AsyncPostgREST, on the sync Supabase client."""
+
+    def __init__(self, client: Client):
+        self._c = client
+
+    async def select(
+        self,
+        table: str,
+        columns: str = "*",
+        eq: Optional[Dict[str, Any]] = None,
+        filters: Sequence[Filter] = (),
+        order: Sequence[Order] = (),
+        limit: Optional[int] = None,
+        or_: Optional[str] = None,
+    ) -> List[dict]:
+        def q():
+            b = _apply_filters(self._c.table(table).select(columns), eq, filters)
+            if or_:
+                b = b.or_(or_)
+            for col, desc in order:
+                b = b.order(col, desc=desc)
+            if limit is not None:
+                b = b.limit(limit)
+            return b.execute().data or []
+        return await _run(q, f"{table}.select")
+
+    async def insert(self, table: str, data: Any) -> List[dict]:
+        return await _run(lambda: self._c.table(table).insert(data).execute().data or [], f"{table}.insert")
+
+    async def upsert(self, table: str, data: Any, on_conflict: str) -> List[dict]:
+        return await _run(lambda: self._c.table(table).upsert(data, on_conflict=on_conflict).execute().data or [], f"{table}.upsert")
+
+    async def update(
+        self, table: str, data: dict, eq: Optional[Dict[str, Any]] = None, filters: Sequence[Filter] = ()
+    ) -> List[dict]:
+        return await _run(lambda: _apply_filters(self._c.table(table).update(data), eq, filters).execute().data or [], f"{table}.update")
+
+    async def delete(
+        self, table: str, eq: Optional[Dict[str, Any]] = None, filters: Sequence[Filter] = ()
+    ) -> List[dict]:
+        return await _run(lambda: _apply_filters(self._c.table(table).delete(), eq, filters).execute().data or [], f"{table}.delete")
+
+    async def rpc(self, fn: str, params: dict) -> Any:
+        return await _run(lambda: self._c.rpc(fn, params).execute().data, f"rpc.{fn}")
+
+    async def aclose(self):
+        pass
+
+
+_db_client = None
+
+
+def _db():
+    """Configured query transport, created on first use."""
+    global _db_client
+    if _db_client is None:
+        if DB_CLIENT == "sync":
+            _db_client = SyncSupabase(_sb_client())
+        else:
+            _db_client = AsyncPostgREST(
+                SUPABASE_URL,
+                SUPABASE_SERVICE_KEY,
+                max_connections=DB_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=DB_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=DB_POOL_KEEPALIVE_EXPIRY,
+                timeout=DB_TIMEOUT,
+                http2=DB_HTTP2,
+            )
+    return _db_client
+
+
+async def init() -> bool:
+    """Create the transport and open its first connection (app startup, per worker)."""
+    _db()
+    return await db_ping()
+
+
+async def close():
+    """Drain buffered writes, then release the transport's connections (app shutdown)."""
+    global _db_client
+    if write_buffer is not None:
+        await write_buffer.stop()
+    if _db_client is not None:
+        await _db_client.aclose()
+        _db_client = None
+
+
+_flights: Dict[str, SingleFlight] = {}
+
+
+def _shallow_copy(value: Any) -> Any:
+    """Copy rows (and tuples/lists of rows) so no two callers share a mutable result."""
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, (list, tuple)):
+        return type(value)(_shallow_copy(v) for v in value)
+    return value
+
+
+def coalesced(fn):
+    """Opt a read into single-flight: concurrent calls with equal arguments share one query.
+
+    Every caller, including the one that ran the query, gets its own shallow
+    copy of the result; an exception is raised to all of them. A call that
+    joins an in-flight read may miss a write that landed after that read was
+    sent, so only mark reads whose callers tolerate that (the same window as
+    reading a moment earlier).
+    """
+    flight = _flights.setdefault(fn.__name__, SingleFlight())
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        if not DB_COALESCE_READS:
+            return await fn(*args, **kwargs)
+        key = (args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return await fn(*args, **kwargs)
+        return _shallow_copy(await flight.do(key, lambda: fn(*args, **kwargs)))
+
+    return wrapper
+
+
+def coalesce_stats() -> dict:
+    """Per-function call and deduplication counts for @coalesced reads."""
+    return {name: flight.stats() for name, flight in _flights.items()}
 
 
 def _serialize_dt(dt: datetime) -> str:
@@ -39,65 +315,299 @@ def _serialize_dt(dt: datetime) -> str:
 
 
 def _strip_id(row: dict) -> dict:
-    """Remove 'id' (bigserial) from row for API compatibility."""
-    return {k: v for k, v in row.items() if k != "id"}
+    """Remove 'id' (bigserial) from row for API compatibility.
+
+    Only write paths need this (they return full rows); reads select explicit columns.
+    Rows are freshly decoded JSON, so this edits in place instead of copying.
+    """
+    row.pop("id", None)
+    return row
+
+
+def _parse_dts(d: dict, *dt_keys: str) -> dict:
+    for k in dt_keys:
+        if d.get(k) and isinstance(d[k], str):
+            d[k] = datetime.fromisoformat(d[k].replace("Z", "+00:00"))
+    return d
+
+
+def _first_row(rows: List[dict], *dt_keys: str) -> Optional[dict]:
+    """First returned row without 'id', with ISO timestamp columns parsed."""
+    if not rows:
+        return None
+    return _parse_dts(_strip_id(rows[0]), *dt_keys)
+
+
+def _data_columns(key_column: str, fields: Optional[Sequence[str]]) -> str:
+    """Select list for JSONB-backed tables, projecting data server-side when fields are given."""
+    if fields is None:
+        return f"{key_column},data"
+    return ",".join([key_column] + [f"{f}:data->{f}" for f in fields])
+
+
+def _merge_data_row(row: dict, key_column: str, fields: Optional[Sequence[str]]) -> dict:
+    if fields is None:
+        return {"id": row.get(key_column), **(row.get("data") or {})}
+    return {"id": row.get(key_column), **{f: row.get(f) for f in fields}}
+
+
+# table -> upsert conflict target for the buffered tables
+_BUFFERED_TABLES = {
+    "analysis_entries": "user_id,entry_id",
+    "batching_scripts": "user_id,script_id",
+}
+
+
+async def _flush_buffered(table: str, payloads: List[dict]):
+    await _db().upsert(table, payloads, on_conflict=_BUFFERED_TABLES[table])
+
+
+# PostgREST errors are about the rows sent; anything else (timeouts, resets) retries the batch whole
+write_buffer: Optional[WriteBuffer] = (
+    WriteBuffer(_flush_buffered, WRITE_COALESCE_MS / 1000, is_row_error=lambda e: isinstance(e, APIError))
+    if WRITE_COALESCE_MS > 0
+    else None
+)
+
+
+async def _upsert_data_rows(
+    table: str, key_column: str, user_id: str, rows: Sequence[Tuple[str, dict]], buffered: bool = True
+):
+    """Upsert (key, data) rows now, or hand them to the write buffer when enabled.
+
+    buffered=False writes through even with the buffer on, for callers that
+    must know the rows landed; older buffered writes of those rows are dropped.
+    """
+    payloads = [{"user_id": user_id, key_column: str(key), "data": data} for key, data in rows]
+    if not payloads:
+        return
+    if write_buffer is not None and buffered:
+        for payload in payloads:
+            write_buffer.put(table, user_id, payload[key_column], payload)
+    else:
+        await _discard_buffered(table, user_id, [p[key_column] for p in payloads])
+        await _db().upsert(table, payloads if len(payloads) > 1 else payloads[0], on_conflict=_BUFFERED_TABLES[table])
+    _changed(table, user_id)
+
+
+async def _discard_buffered(table: str, user_id: str, keys: Optional[Sequence[str]] = None):
+    if write_buffer is not None:
+        await write_buffer.discard(table, user_id, None if keys is None else [str(k) for k in keys])
+
+
+async def _overlay_pending(
+    rows: List[dict], table: str, key_column: str, user_id: str, fields: Optional[Sequence[str]], first_page: bool
+) -> List[dict]:
+    """Merge unflushed buffered writes into rows read from the database (read-your-writes).
+
+    Buffered rows that are not in the database yet are the newest, so they
+    lead the first page (which can then run past the requested limit).
+    """
+    if write_buffer is None:
+        return rows
+    pending = write_buffer.pending(table, user_id)
+    if not pending:
+        return rows
+
+    def merged(key: str) -> dict:
+        data = pending.pop(key)["data"]
+        if fields is None:
+            return {"id": key, **data}
+        return {"id": key, **{f: data.get(f) for f in fields}}
+
+    rows = [merged(row["id"]) if row["id"] in pending else row for row in rows]
+    if first_page and pending:
+        # Updates to rows on later pages are overlaid there, not prepended here
+        stored = await _db().select(
+            table, key_column, eq={"user_id": user_id}, filters=[(key_column, "in", list(pending))]
+        )
+        for row in stored:
+            pending.pop(row[key_column], None)
+        rows = [merged(key) for key in reversed(list(pending))] + rows
+    return rows
+
+
+class InvalidCursor(ValueError):
+    """A pagination cursor that was not issued by this API."""
+
+
+def encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+# Value type of each keyset column a cursor may carry
+CURSOR_TYPES = {"id": int, "completed_at": datetime}
+
+
+def _cursor_value_ok(value: Any, kind: type) -> bool:
+    if kind is int:
+        return isinstance(value, int) and not isinstance(value, bool)
+    if kind is datetime:
+        if not isinstance(value, str):
+            return False
+        try:
+            datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return False
+        return True
+    return False
+
+
+def decode_cursor(cursor: str, kinds: Sequence[type]) -> list:
+    """Values of a cursor from encode_cursor, checked against the expected types."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise InvalidCursor("Malformed cursor")
+    if not isinstance(values, list) or len(values) != len(kinds):
+        raise InvalidCursor("Malformed cursor")
+    if not all(_cursor_value_ok(v, kind) for v, kind in zip(values, kinds)):
+        raise InvalidCursor("Malformed cursor")
+    return values
+
+
+async def _keyset_page(
+    table: str, columns: str, user_id: str, sort: Sequence[str], limit: int, cursor: Optional[str]
+) -> Tuple[List[dict], Optional[str]]:
+    """One page of a user's rows, newest first by sort (one or two columns, the last unique).
+
+    The cursor carries the last row's sort values, so every page is an index
+    range scan on (user_id, *sort) no matter how deep the client pages.
+    """
+    filters: List[Filter] = []
+    or_ = None
+    if cursor is not None:
+        values = decode_cursor(cursor, [CURSOR_TYPES[col] for col in sort])
+        if len(sort) == 1:
+            filters.append((sort[0], "lt", values[0]))
+        else:
+            (a, b), (x, y) = sort, values
+            or_ = f"{a}.lt.{quote_value(x)},and({a}.eq.{quote_value(x)},{b}.lt.{quote_value(y)})"
+    rows = await _db().select(
+        table, columns, eq={"user_id": user_id}, filters=filters, or_=or_,
+        order=[(col, True) for col in sort], limit=limit + 1,
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1][col] for col in sort])
+    return rows, next_cursor
+
+
+# Columns each read returns (everything the API exposes, never the bigserial id)
+USER_COLUMNS = "user_id,email,name,picture,streak,coins,current_planet,last_post_date,created_at"
+SESSION_COLUMNS = "user_id,session_token,expires_at,created_at"
+MISSION_COLUMNS = "user_id,date,completed,created_at"
+SOS_COLUMNS = "user_id,issue_type,asteroids,affirmations,completed_at"
+CREATOR_UNIVERSE_COLUMNS = "user_id,overarching_goal,content_pillars,avatar,identity,updated_at,version"
+SCHEDULE_COLUMNS = "user_id,schedule,updated_at,version"
+STORY_FINDER_COLUMNS = "user_id,rows,updated_at,version"
+CONTENT_TIPS_COLUMNS = "user_id,tip_id,quiz_completed,quiz_score,completed_at"
 
 
 # --- Users ---
+@coalesced
 async def user_find_by_email(email: str) -> Optional[dict]:
-    r = await _run(lambda: _sb_client().table("users").select("*").eq("email", email).execute())
-    if r.data and len(r.data) > 0:
-        return _strip_id(dict(r.data[0]))
-    return None
+    rows = await _db().select("users", USER_COLUMNS, eq={"email": email})
+    return rows[0] if rows else None
 
 
+@coalesced
 async def user_find_by_id(user_id: str) -> Optional[dict]:
-    r = await _run(lambda: _sb_client().table("users").select("*").eq("user_id", user_id).execute())
-    if r.data and len(r.data) > 0:
-        return _strip_id(dict(r.data[0]))
-    return None
+    rows = await _db().select("users", USER_COLUMNS, eq={"user_id": user_id})
+    return rows[0] if rows else None
+
+
+class UserExists(ValueError):
+    """A users row with this user_id or email already exists."""
 
 
 async def user_insert(data: dict):
     data = {**data}
     if "created_at" in data and hasattr(data["created_at"], "isoformat"):
         data["created_at"] = _serialize_dt(data["created_at"])
-    await _run(lambda: _sb_client().table("users").insert(data).execute())
+    try:
+        await _db().insert("users", data)
+    except APIError as e:
+        if e.code == "23505":  # unique_violation on user_id or email
+            raise UserExists(e.message)
+        raise
+    _changed("users", data["user_id"])
 
 
-async def user_update(user_id: str, data: dict):
+async def user_update(user_id: str, data: dict) -> Optional[dict]:
+    """Update the user row; returns it as written."""
     data = {**data}
     for k in list(data.keys()):
         if isinstance(data[k], datetime):
             data[k] = _serialize_dt(data[k])
-    await _run(lambda: _sb_client().table("users").update(data).eq("user_id", user_id).execute())
-
-
-async def user_increment_coins(user_id: str, delta: int):
-    r = await _run(lambda: _sb_client().table("users").select("coins").eq("user_id", user_id).execute())
-    if r.data and len(r.data) > 0:
-        cur = r.data[0].get("coins", 0) or 0
-        await _run(lambda: _sb_client().table("users").update({"coins": cur + delta}).eq("user_id", user_id).execute())
+    rows = await _db().update("users", data, eq={"user_id": user_id})
+    invalidate_user(user_id)
+    return _first_row(rows)
+
+
+async def user_increment_coins(user_id: str, delta: int) -> Optional[dict]:
+    """Atomically add delta to coins (RPC increment_coins); returns the updated user."""
+    rows = await _db().rpc("increment_coins", {"p_user_id": user_id, "p_delta": delta})
+    invalidate_user(user_id)
+    return rows[0] if rows else None
+
+
+async def user_login(
+    user_id: str,
+    email: str,
+    name: str,
+    picture: Optional[str],
+    session_token: str,
+    expires_at: datetime,
+    content_pillars: list,
+    max_sessions: int = 0,
+) -> Tuple[dict, bool]:
+    """Find-or-create the user by email, ensure their universe, rotate sessions (RPC login_user).
+
+    user_id is only used for a new email. Returns (user, created).
+    """
+    rows = await _db().rpc("login_user", {
+        "p_user_id": user_id,
+        "p_email": email,
+        "p_name": name,
+        "p_picture": picture,
+        "p_session_token": session_token,
+        "p_expires_at": _serialize_dt(expires_at),
+        "p_content_pillars": content_pillars,
+        "p_max_sessions": max_sessions,
+    })
+    user = rows[0]["user_doc"]
+    invalidate_user(user["user_id"])
+    return user, rows[0]["created"]
 
 
 async def user_delete(user_id: str):
-    await _run(lambda: _sb_client().table("users").delete().eq("user_id", user_id).execute())
+    await _db().delete("users", eq={"user_id": user_id})
+    invalidate_user(user_id)
 
 
 # --- Sessions ---
+@coalesced
 async def session_find_by_token(token: str) -> Optional[dict]:
-    r = await _run(lambda: _sb_client().table("user_sessions").select("*").eq("session_token", token).execute())
-    if r.data and len(r.data) > 0:
-        d = dict(r.data[0])
-        for k in ("expires_at", "created_at"):
-            if d.get(k) and isinstance(d[k], str):
-                d[k] = datetime.fromisoformat(d[k].replace("Z", "+00:00"))
-        return _strip_id(d)
+    rows = await _db().select("user_sessions", SESSION_COLUMNS, eq={"session_token": token})
+    if rows:
+        return _parse_dts(rows[0], "expires_at", "created_at")
+    return None
+
+
+@coalesced
+async def session_user_find_by_token(token: str) -> Optional[Tuple[dict, dict]]:
+    """Unexpired session and its user in one query (RPC session_user_by_token)."""
+    rows = await _db().rpc("session_user_by_token", {"p_token": token})
+    if rows:
+        return _parse_dts(rows[0]["session_doc"], "expires_at", "created_at"), rows[0]["user_doc"]
     return None
 
 
 async def session_delete_by_user(user_id: str):
-    await _run(lambda: _sb_client().table("user_sessions").delete().eq("user_id", user_id).execute())
+    await _db().delete("user_sessions", eq={"user_id": user_id})
+    _changed("user_sessions", user_id)
 
 
 async def session_insert(data: dict):
@@ -105,33 +615,45 @@ async def session_insert(data: dict):
     for k in ("expires_at", "created_at"):
         if k in data and hasattr(data[k], "isoformat"):
             data[k] = _serialize_dt(data[k])
-    await _run(lambda: _sb_client().table("user_sessions").insert(data).execute())
+    await _db().insert("user_sessions", data)
+    _changed("user_sessions", data["user_id"])
 
 
 # --- Missions ---
+@coalesced
 async def mission_find(user_id: str, date: str) -> Optional[dict]:
-    r = await _run(lambda: _sb_client().table("missions").select("*").eq("user_id", user_id).eq("date", date).execute())
-    if r.data and len(r.data) > 0:
-        d = dict(r.data[0])
-        if d.get("created_at") and isinstance(d["created_at"], str):
-            d["created_at"] = datetime.fromisoformat(d["created_at"].replace("Z", "+00:00"))
-        return _strip_id(d)
+    rows = await _db().select("missions", MISSION_COLUMNS, eq={"user_id": user_id, "date": date})
+    if rows:
+        return _parse_dts(rows[0], "created_at")
     return None
 
 
-async def mission_upsert(data: dict):
+async def mission_upsert(data: dict) -> Optional[dict]:
     data = {**data}
     if "created_at" in data and hasattr(data["created_at"], "isoformat"):
         data["created_at"] = _serialize_dt(data["created_at"])
-    await _run(lambda: _sb_client().table("missions").upsert(data, on_conflict="user_id,date").execute())
+    rows = await _db().upsert("missions", data, on_conflict="user_id,date")
+    _changed("missions", data["user_id"])
+    return _first_row(rows, "created_at")
+
 
+async def mission_complete(user_id: str, date: str, coins: int) -> Tuple[bool, Optional[dict]]:
+    """Complete the day's mission and award streak, coins and planet atomically (RPC complete_mission).
 
-async def mission_update_completed(user_id: str, date: str):
-    await _run(lambda: _sb_client().table("missions").update({"completed": True}).eq("user_id", user_id).eq("date", date).execute())
+    Returns (already_completed, user); nothing is awarded when already_completed.
+    """
+    rows = await _db().rpc("complete_mission", {"p_user_id": user_id, "p_date": date, "p_coins": coins})
+    if not rows:
+        return False, None
+    if not rows[0]["already_completed"]:
+        _changed("missions", user_id)
+        invalidate_user(user_id)
+    return rows[0]["already_completed"], rows[0]["user_doc"]
 
 
 async def mission_delete_by_user(user_id: str):
-    await _run(lambda: _sb_client().table("missions").delete().eq("user_id", user_id).execute())
+    await _db().delete("missions", eq={"user_id": user_id})
+    _changed("missions", user_id)
 
 
 # --- SOS ---
@@ -141,213 +663,514 @@ async def sos_insert(data: dict):
     data["affirmations"] = data.get("affirmations", [])
     if "completed_at" in data and hasattr(data["completed_at"], "isoformat"):
         data["completed_at"] = _serialize_dt(data["completed_at"])
-    await _run(lambda: _sb_client().table("sos_completions").insert(data).execute())
+    await _db().insert("sos_completions", data)
+    _changed("sos_completions", data["user_id"])
 
 
-async def sos_list(user_id: str, limit: int = 100) -> List[dict]:
-    r = await _run(
-        lambda: _sb_client().table("sos_completions").select("*").eq("user_id", user_id).order("completed_at", desc=True).limit(limit).execute()
-    )
+async def sos_page(
+    user_id: str, limit: int = 100, cursor: Optional[str] = None, fields: Optional[Sequence[str]] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """SOS completions newest first, keyset-paginated; fields narrows the returned columns."""
+    wanted = list(fields) if fields is not None else SOS_COLUMNS.split(",")
+    columns = ",".join(dict.fromkeys(wanted + ["completed_at", "id"]))
+    rows, next_cursor = await _keyset_page("sos_completions", columns, user_id, ("completed_at", "id"), limit, cursor)
     out = []
-    for row in r.data or []:
-        d = _strip_id(dict(row))
-        if d.get("completed_at") and isinstance(d["completed_at"], str):
-            d["completed_at"] = datetime.fromisoformat(d["completed_at"].replace("Z", "+00:00"))
-        out.append(d)
-    return out
+    for row in rows:
+        out.append(_parse_dts({k: row[k] for k in wanted if k in row}, "completed_at"))
+    return out, next_cursor
+
+
+async def sos_list(user_id: str, limit: int = 100, fields: Optional[Sequence[str]] = None) -> List[dict]:
+    history, _ = await sos_page(user_id, limit, fields=fields)
+    return history
 
 
 async def sos_delete_by_user(user_id: str):
-    await _run(lambda: _sb_client().table("sos_completions").delete().eq("user_id", user_id).execute())
+    await _db().delete("sos_completions", eq={"user_id": user_id})
+    _changed("sos_completions", user_id)
 
 
 # --- Creator Universe ---
+@coalesced
 async def creator_universe_find(user_id: str) -> Optional[dict]:
-    r = await _run(lambda: _sb_client().table("creator_universe").select("*").eq("user_id", user_id).execute())
-    if r.data and len(r.data) > 0:
-        d = dict(r.data[0])
-        if d.get("updated_at") and isinstance(d["updated_at"], str):
-            d["updated_at"] = datetime.fromisoformat(d["updated_at"].replace("Z", "+00:00"))
-        return _strip_id(d)
-    return None
+    rows = await _db().select("creator_universe", CREATOR_UNIVERSE_COLUMNS, eq={"user_id": user_id})
+    return _first_row(rows, "updated_at")
 
 
-async def creator_universe_insert(data: dict):
+async def creator_universe_insert(data: dict) -> Optional[dict]:
     data = {**data}
     if "updated_at" in data and hasattr(data["updated_at"], "isoformat"):
         data["updated_at"] = _serialize_dt(data["updated_at"])
-    await _run(lambda: _sb_client().table("creator_universe").insert(data).execute())
+    rows = await _db().insert("creator_universe", data)
+    _changed("creator_universe", data["user_id"])
+    return _first_row(rows, "updated_at")
 
 
-async def creator_universe_update(user_id: str, data: dict):
+async def creator_universe_update(user_id: str, data: dict) -> Optional[dict]:
+    """Update the universe; returns it as written (None if the user has none)."""
     data = {**data}
     if "updated_at" in data and hasattr(data["updated_at"], "isoformat"):
         data["updated_at"] = _serialize_dt(data["updated_at"])
-    await _run(lambda: _sb_client().table("creator_universe").update(data).eq("user_id", user_id).execute())
+    rows = await _db().update("creator_universe", data, eq={"user_id": user_id})
+    _changed("creator_universe", user_id)
+    return _first_row(rows, "updated_at")
+
+
+class InvalidPatch(ValueError):
+    """A merge patch / JSON Patch the database refused to apply."""
+
+
+async def creator_universe_patch(
+    user_id: str, merge: Optional[dict] = None, ops: Optional[List[dict]] = None
+) -> Optional[dict]:
+    """Apply an RFC 7386 merge patch and/or RFC 6902 ops in the database (RPC creator_universe_patch).
+
+    Only the patch crosses the wire; returns the updated universe, or None if the user has none.
+    """
+    try:
+        rows = await _db().rpc("creator_universe_patch", {"p_user_id": user_id, "p_merge": merge, "p_ops": ops})
+    except APIError as e:
+        if e.code == "22023":  # invalid_parameter_value, raised by the patch functions
+            raise InvalidPatch(e.message)
+        raise
+    _changed("creator_universe", user_id)
+    return _first_row(rows or [], "updated_at")
 
 
 async def creator_universe_delete_by_user(user_id: str):
-    await _run(lambda: _sb_client().table("creator_universe").delete().eq("user_id", user_id).execute())
+    await _db().delete("creator_universe", eq={"user_id": user_id})
+    _changed("creator_universe", user_id)
 
 
 # --- Analysis entries ---
-async def analysis_list(user_id: str, limit: int = 100) -> List[dict]:
-    r = await _run(lambda: _sb_client().table("analysis_entries").select("*").eq("user_id", user_id).limit(limit).execute())
-    out = []
-    for row in r.data or []:
-        d = dict(row)
-        entry_id = d.pop("entry_id", None)
-        data = d.pop("data", {}) or {}
-        merged = {"id": entry_id, **data}
-        out.append(merged)
-    return out
+async def analysis_page(
+    user_id: str, limit: int = 100, cursor: Optional[str] = None, fields: Optional[Sequence[str]] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """Entries as {"id": entry_id, **data}, newest first and keyset-paginated.
+
+    fields projects the JSONB data in the query.
+    """
+    columns = "id," + _data_columns("entry_id", fields)
+    rows, next_cursor = await _keyset_page("analysis_entries", columns, user_id, ("id",), limit, cursor)
+    entries = [_merge_data_row(row, "entry_id", fields) for row in rows]
+    return await _overlay_pending(entries, "analysis_entries", "entry_id", user_id, fields, cursor is None), next_cursor
+
+
+async def analysis_list(user_id: str, limit: int = 100, fields: Optional[Sequence[str]] = None) -> List[dict]:
+    entries, _ = await analysis_page(user_id, limit, fields=fields)
+    return entries
 
 
 async def analysis_upsert(user_id: str, entry_id: str, data: dict):
-    payload = {"user_id": user_id, "entry_id": str(entry_id), "data": data}
-    await _run(lambda: _sb_client().table("analysis_entries").upsert(payload, on_conflict="user_id,entry_id").execute())
+    await _upsert_data_rows("analysis_entries", "entry_id", user_id, [(entry_id, data)])
+
+
+async def analysis_upsert_many(user_id: str, entries: Sequence[Tuple[str, dict]], buffered: bool = True):
+    """Upsert (entry_id, data) pairs in one request."""
+    await _upsert_data_rows("analysis_entries", "entry_id", user_id, entries, buffered)
 
 
 async def analysis_delete(user_id: str, entry_id: str) -> bool:
-    r = await _run(lambda: _sb_client().table("analysis_entries").delete().eq("user_id", user_id).eq("entry_id", str(entry_id)).execute())
-    return (r.data or []) and len(r.data) > 0
+    """Delete one entry; True if it existed (in the database or only in the write buffer)."""
+    buffered = str(entry_id) in (write_buffer.pending("analysis_entries", user_id) if write_buffer else {})
+    await _discard_buffered("analysis_entries", user_id, [entry_id])
+    rows = await _db().delete("analysis_entries", eq={"user_id": user_id, "entry_id": str(entry_id)})
+    _changed("analysis_entries", user_id)
+    return buffered or len(rows) > 0
+
+
+# A claimed key whose push never finished (worker crash) can be re-claimed after this
+SYNC_PUSH_LEASE_SECONDS = int(os.environ.get("SYNC_PUSH_LEASE_SECONDS", "120"))
+
+
+async def sync_push_keys_claim(user_id: str, keys: Sequence[str]) -> Dict[str, str]:
+    """Claim idempotency keys (RPC claim_sync_push_keys).
+    
+    Maps each key to "claimed" (this call owns it), "applied" (its write
+    landed before) or "pending" (another request is still applying it).
+    """
+    if not keys:
+        return {}
+    rows = await _db().rpc("claim_sync_push_keys", {
+        "p_user_id": user_id,
+        "p_keys": list(keys),
+        "p_lease": f"{SYNC_PUSH_LEASE_SECONDS} seconds",
+    })
+    return {row["idempotency_key"]: row["status"] for row in rows}
+
+
+async def sync_push_keys_applied(user_id: str, keys: Sequence[str]):
+    """Mark claimed keys whose writes landed; only these answer duplicate from now on."""
+    if keys:
+        await _db().update(
+            "sync_push_keys", {"applied": True}, eq={"user_id": user_id}, filters=[("idempotency_key", "in", list(keys))]
+        )
+
+
+async def sync_push_keys_release(user_id: str, keys: Sequence[str]):
+    """Forget claimed keys whose writes did not land, so a retry applies them."""
+    if keys:
+        await _db().delete(
+            "sync_push_keys",
+            eq={"user_id": user_id, "applied": False},
+            filters=[("idempotency_key", "in", list(keys))],
+        )
+
+
+async def analysis_delete_many(user_id: str, entry_ids: Sequence[str]):
+    await _discard_buffered("analysis_entries", user_id, entry_ids)
+    if entry_ids:
+        await _db().delete("analysis_entries", eq={"user_id": user_id}, filters=[("entry_id", "in", [str(i) for i in entry_ids])])
+        _changed("analysis_entries", user_id)
 
 
 async def analysis_find_all(user_id: str) -> List[dict]:
-    r = await _run(lambda: _sb_client().table("analysis_entries").select("*").eq("user_id", user_id).execute())
-    return list(r.data or [])
+    rows = await _db().select("analysis_entries", "user_id,entry_id,data", eq={"user_id": user_id})
+    return rows
 
 
 async def analysis_delete_by_user(user_id: str):
-    await _run(lambda: _sb_client().table("analysis_entries").delete().eq("user_id", user_id).execute())
+    await _discard_buffered("analysis_entries", user_id)
+    await _db().delete("analysis_entries", eq={"user_id": user_id})
+    _changed("analysis_entries", user_id)
 
 
 # --- Schedule ---
+@coalesced
 async def schedule_find(user_id: str) -> Optional[dict]:
-    r = await _run(lambda: _sb_client().table("schedule").select("*").eq("user_id", user_id).execute())
-    if r.data and len(r.data) > 0:
-        d = dict(r.data[0])
-        if d.get("updated_at") and isinstance(d["updated_at"], str):
-            d["updated_at"] = datetime.fromisoformat(d["updated_at"].replace("Z", "+00:00"))
-        return _strip_id(d)
-    return None
+    rows = await _db().select("schedule", SCHEDULE_COLUMNS, eq={"user_id": user_id})
+    return _first_row(rows, "updated_at")
 
 
-async def schedule_insert(data: dict):
+async def schedule_insert(data: dict) -> Optional[dict]:
     data = {**data}
     if "updated_at" in data and hasattr(data["updated_at"], "isoformat"):
         data["updated_at"] = _serialize_dt(data["updated_at"])
-    await _run(lambda: _sb_client().table("schedule").insert(data).execute())
+    rows = await _db().insert("schedule", data)
+    _changed("schedule", data["user_id"])
+    return _first_row(rows, "updated_at")
 
 
-async def schedule_upsert(data: dict):
+async def schedule_upsert(data: dict) -> Optional[dict]:
+    """Insert or replace the schedule; returns it as written."""
     data = {**data}
     if "updated_at" in data and hasattr(data["updated_at"], "isoformat"):
         data["updated_at"] = _serialize_dt(data["updated_at"])
-    await _run(lambda: _sb_client().table("schedule").upsert(data, on_conflict="user_id").execute())
+    rows = await _db().upsert("schedule", data, on_conflict="user_id")
+    _changed("schedule", data["user_id"])
+    return _first_row(rows, "updated_at")
 
 
 async def schedule_delete_by_user(user_id: str):
-    await _run(lambda: _sb_client().table("schedule").delete().eq("user_id", user_id).execute())
+    await _db().delete("schedule", eq={"user_id": user_id})
+    _changed("schedule", user_id)
 
 
 # --- Story finder ---
+@coalesced
 async def story_finder_find(user_id: str) -> Optional[dict]:
-    r = await _run(lambda: _sb_client().table("story_finder").select("*").eq("user_id", user_id).execute())
-    if r.data and len(r.data) > 0:
-        return _strip_id(dict(r.data[0]))
-    return None
+    rows = await _db().select("story_finder", STORY_FINDER_COLUMNS, eq={"user_id": user_id})
+    return _first_row(rows, "updated_at")
 
 
-async def story_finder_upsert(user_id: str, rows: list, updated_at: datetime):
+async def story_finder_upsert(user_id: str, rows: list, updated_at: datetime) -> Optional[dict]:
     payload = {"user_id": user_id, "rows": rows, "updated_at": _serialize_dt(updated_at)}
-    await _run(lambda: _sb_client().table("story_finder").upsert(payload, on_conflict="user_id").execute())
+    written = await _db().upsert("story_finder", payload, on_conflict="user_id")
+    _changed("story_finder", user_id)
+    return _first_row(written, "updated_at")
+
+
+class RowLimitExceeded(ValueError):
+    """A row-addressed insert would grow a document past its row limit."""
+
+
+async def _story_finder_row_rpc(fn: str, params: dict) -> Optional[dict]:
+    """Run one of the story_finder_row_* RPCs; returns {updated_at, version, row_position} or None."""
+    rows = await _db().rpc(fn, params)
+    if not rows:
+        return None
+    _changed("story_finder", params["p_user_id"])
+    return _parse_dts(rows[0], "updated_at")
+
+
+async def story_finder_row_upsert(user_id: str, row: dict, max_rows: int) -> dict:
+    """Replace the row with row["id"] in place, or append it (RPC story_finder_row_upsert)."""
+    try:
+        result = await _story_finder_row_rpc(
+            "story_finder_row_upsert", {"p_user_id": user_id, "p_row": row, "p_max_rows": max_rows}
+        )
+    except APIError as e:
+        if e.code == "22023":
+            raise RowLimitExceeded(e.message)
+        raise
+    return result
+
+
+async def story_finder_row_delete(user_id: str, row_id: str) -> Optional[dict]:
+    """Remove one row; None if it did not exist."""
+    return await _story_finder_row_rpc("story_finder_row_delete", {"p_user_id": user_id, "p_row_id": row_id})
+
+
+async def story_finder_row_move(user_id: str, row_id: str, position: int) -> Optional[dict]:
+    """Move one row to position (clamped); None if it did not exist."""
+    return await _story_finder_row_rpc(
+        "story_finder_row_move", {"p_user_id": user_id, "p_row_id": row_id, "p_position": position}
+    )
 
 
 async def story_finder_delete_by_user(user_id: str):
-    await _run(lambda: _sb_client().table("story_finder").delete().eq("user_id", user_id).execute())
+    await _db().delete("story_finder", eq={"user_id": user_id})
+    _changed("story_finder", user_id)
 
 
 # --- Content tips progress ---
 async def content_tips_find(user_id: str, tip_id: str) -> Optional[dict]:
-    r = await _run(
-        lambda: _sb_client().table("content_tips_progress").select("*").eq("user_id", user_id).eq("tip_id", tip_id).execute()
-    )
-    if r.data and len(r.data) > 0:
-        d = dict(r.data[0])
-        if d.get("completed_at") and isinstance(d["completed_at"], str):
-            d["completed_at"] = datetime.fromisoformat(d["completed_at"].replace("Z", "+00:00"))
-        return _strip_id(d)
+    rows = await _db().select("content_tips_progress", CONTENT_TIPS_COLUMNS, eq={"user_id": user_id, "tip_id": tip_id})
+    if rows:
+        return _parse_dts(rows[0], "completed_at")
     return None
 
 
-async def content_tips_insert(data: dict):
+async def content_tips_insert(data: dict) -> Optional[dict]:
     data = {**data}
     if "completed_at" in data and data["completed_at"] and hasattr(data["completed_at"], "isoformat"):
         data["completed_at"] = _serialize_dt(data["completed_at"])
-    await _run(lambda: _sb_client().table("content_tips_progress").insert(data).execute())
+    rows = await _db().insert("content_tips_progress", data)
+    _changed("content_tips_progress", data["user_id"])
+    return _first_row(rows, "completed_at")
 
 
-async def content_tips_update(user_id: str, tip_id: str, data: dict):
-    data = {**data}
-    if "completed_at" in data and data["completed_at"] and hasattr(data["completed_at"], "isoformat"):
-        data["completed_at"] = _serialize_dt(data["completed_at"])
-    await _run(
-        lambda: _sb_client().table("content_tips_progress").update(data).eq("user_id", user_id).eq("tip_id", tip_id).execute()
-    )
+async def content_tips_complete_quiz(user_id: str, tip_id: str, score: int, coins: int) -> Tuple[int, Optional[dict]]:
+    """Mark the quiz completed and award coins once, in one statement (RPC complete_quiz).
 
+    Returns (coins_earned, user); coins_earned is 0 when it was already completed.
+    """
+    rows = await _db().rpc("complete_quiz", {"p_user_id": user_id, "p_tip_id": tip_id, "p_score": score, "p_coins": coins})
+    if not rows:
+        return 0, None
+    if rows[0]["coins_earned"]:
+        _changed("content_tips_progress", user_id)
+        invalidate_user(user_id)
+    return rows[0]["coins_earned"], rows[0]["user_doc"]
 
+
+@coalesced
 async def content_tips_list(user_id: str) -> List[dict]:
-    r = await _run(lambda: _sb_client().table("content_tips_progress").select("*").eq("user_id", user_id).execute())
-    out = []
-    for row in r.data or []:
-        d = _strip_id(dict(row))
-        if d.get("completed_at") and isinstance(d["completed_at"], str):
-            d["completed_at"] = datetime.fromisoformat(d["completed_at"].replace("Z", "+00:00"))
-        out.append(d)
-    return out
+    rows = await _db().select("content_tips_progress", CONTENT_TIPS_COLUMNS, eq={"user_id": user_id})
+    return [_parse_dts(row, "completed_at") for row in rows]
 
 
 async def content_tips_delete_by_user(user_id: str):
-    await _run(lambda: _sb_client().table("content_tips_progress").delete().eq("user_id", user_id).execute())
+    await _db().delete("content_tips_progress", eq={"user_id": user_id})
+    _changed("content_tips_progress", user_id)
 
 
 # --- Batching scripts ---
-async def batching_list(user_id: str) -> List[dict]:
-    r = await _run(lambda: _sb_client().table("batching_scripts").select("*").eq("user_id", user_id).execute())
-    out = []
-    for row in r.data or []:
-        d = dict(row)
-        script_id = d.pop("script_id", None)
-        data = d.pop("data", {}) or {}
-        merged = {"id": script_id, **data}
-        out.append(merged)
-    return out
+async def batching_page(
+    user_id: str, limit: int = 100, cursor: Optional[str] = None, fields: Optional[Sequence[str]] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """Scripts as {"id": script_id, **data}, newest first and keyset-paginated.
+
+    fields projects the JSONB data in the query.
+    """
+    columns = "id," + _data_columns("script_id", fields)
+    rows, next_cursor = await _keyset_page("batching_scripts", columns, user_id, ("id",), limit, cursor)
+    scripts = [_merge_data_row(row, "script_id", fields) for row in rows]
+    return await _overlay_pending(scripts, "batching_scripts", "script_id", user_id, fields, cursor is None), next_cursor
+
+
+async def batching_list(user_id: str, limit: int = 100, fields: Optional[Sequence[str]] = None) -> List[dict]:
+    scripts, _ = await batching_page(user_id, limit, fields=fields)
+    return scripts
 
 
 async def batching_upsert(user_id: str, script_id: str, data: dict):
-    payload = {"user_id": user_id, "script_id": str(script_id), "data": data}
-    await _run(lambda: _sb_client().table("batching_scripts").upsert(payload, on_conflict="user_id,script_id").execute())
+    await _upsert_data_rows("batching_scripts", "script_id", user_id, [(script_id, data)])
+
+
+async def batching_upsert_many(user_id: str, scripts: Sequence[Tuple[str, dict]], buffered: bool = True):
+    """Upsert (script_id, data) pairs in one request."""
+    await _upsert_data_rows("batching_scripts", "script_id", user_id, scripts, buffered)
 
 
 async def batching_find_all(user_id: str) -> List[dict]:
-    r = await _run(lambda: _sb_client().table("batching_scripts").select("*").eq("user_id", user_id).execute())
-    return list(r.data or [])
+    rows = await _db().select("batching_scripts", "user_id,script_id,data,archived", eq={"user_id": user_id})
+    return rows
 
 
 async def batching_delete(user_id: str, script_id: str) -> bool:
-    r = await _run(lambda: _sb_client().table("batching_scripts").delete().eq("user_id", user_id).eq("script_id", str(script_id)).execute())
-    return (r.data or []) and len(r.data) > 0
+    """Delete one script; True if it existed (in the database or only in the write buffer)."""
+    buffered = str(script_id) in (write_buffer.pending("batching_scripts", user_id) if write_buffer else {})
+    await _discard_buffered("batching_scripts", user_id, [script_id])
+    rows = await _db().delete("batching_scripts", eq={"user_id": user_id, "script_id": str(script_id)})
+    _changed("batching_scripts", user_id)
+    return buffered or len(rows) > 0
+
+
+async def batching_delete_many(user_id: str, script_ids: Sequence[str]):
+    await _discard_buffered("batching_scripts", user_id, script_ids)
+    if script_ids:
+        await _db().delete("batching_scripts", eq={"user_id": user_id}, filters=[("script_id", "in", [str(i) for i in script_ids])])
+        _changed("batching_scripts", user_id)
 
 
 async def batching_delete_by_user(user_id: str):
-    await _run(lambda: _sb_client().table("batching_scripts").delete().eq("user_id", user_id).execute())
+    await _discard_buffered("batching_scripts", user_id)
+    await _db().delete("batching_scripts", eq={"user_id": user_id})
+    _changed("batching_scripts", user_id)
+
+
+# --- Sync ---
+# Rows committed by a slow transaction carry an updated_at from when it began,
+# possibly before the clock read the token is based on; re-reading this
+# window catches them.
+SYNC_OVERLAP_SECONDS = float(os.environ.get("SYNC_OVERLAP_SECONDS", "5"))
+# Keep in step with prune_sync_tombstones(); older tokens get a full resync
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.environ.get("SYNC_TOMBSTONE_RETENTION_DAYS", "30"))
+
+# table -> (select columns, key column; None for one-row-per-user documents,
+# whose upserts and deletes are keyed by the user_id)
+SYNC_TABLES: Dict[str, Tuple[str, Optional[str]]] = {
+    "analysis_entries": ("entry_id,data,updated_at", "entry_id"),
+    "batching_scripts": ("script_id,data,updated_at", "script_id"),
+    "content_tips_progress": (CONTENT_TIPS_COLUMNS + ",updated_at", "tip_id"),
+    "creator_universe": (CREATOR_UNIVERSE_COLUMNS, None),
+    "schedule": (SCHEDULE_COLUMNS, None),
+    "story_finder": (STORY_FINDER_COLUMNS, None),
+}
+
+
+def _parse_ts(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _sync_row(table: str, key_column: Optional[str], row: dict) -> dict:
+    if table in ("analysis_entries", "batching_scripts"):
+        return _merge_data_row(row, key_column, None)
+    if table == "content_tips_progress":
+        row.pop("updated_at", None)
+        return _parse_dts(row, "completed_at")
+    return _parse_dts(row, "updated_at")
+
+
+async def sync_changes(user_id: str, token: Optional[str]) -> dict:
+    """Rows upserted or deleted in each synced table since token, plus the next token.
+
+    Without a token (or with one older than the tombstone retention) every row
+    is returned and "reset" tells the client to replace its local copy. The
+    next token is the database clock when this sync started, so it stays
+    fresh for users whose data has not changed in a long time.
+    """
+    since = None
+    if token is not None:
+        try:
+            since = _parse_ts(decode_cursor(token, [datetime])[0])
+        except (AttributeError, TypeError, ValueError):
+            raise InvalidCursor("Malformed sync token")
+        if since.tzinfo is None:
+            raise InvalidCursor("Malformed sync token")
+
+    # Read before the rows: anything committed later is newer than the token
+    clock = _parse_ts(await _db().rpc("sync_clock", {}))
+    if since is not None and (clock - since).days >= SYNC_TOMBSTONE_RETENTION_DAYS:
+        since = None
+
+    filters: List[Filter] = []
+    if since is not None:
+        floor = _serialize_dt(datetime.fromtimestamp(since.timestamp() - SYNC_OVERLAP_SECONDS, timezone.utc))
+        filters = [("updated_at", "gt", floor)]
+    reads = [
+        _db().select(table, columns, eq={"user_id": user_id}, filters=filters, order=[("updated_at", False)])
+        for table, (columns, _) in SYNC_TABLES.items()
+    ]
+    if since is not None:
+        reads.append(_db().select(
+            "sync_tombstones", "table_name,row_key,deleted_at",
+            eq={"user_id": user_id}, filters=[("deleted_at", "gt", floor)], order=[("deleted_at", False)],
+        ))
+    results = await asyncio.gather(*reads)
+
+    # Database time only, never this server's clock
+    latest = clock
+    # table -> key -> (timestamp, row or None for a delete); the newest event per key wins
+    events: Dict[str, Dict[Any, Tuple[datetime, Optional[dict]]]] = {}
+    for (table, (_, key_column)), rows in zip(SYNC_TABLES.items(), results):
+        by_key = events[table] = {}
+        for row in rows:
+            ts = _parse_ts(row["updated_at"])
+            latest = max(latest, ts)
+            by_key[row[key_column] if key_column else user_id] = (ts, _sync_row(table, key_column, row))
+    if since is not None:
+        for row in results[-1]:
+            ts = _parse_ts(row["deleted_at"])
+            latest = max(latest, ts)
+            by_key = events.get(row["table_name"])
+            if by_key is not None and (row["row_key"] not in by_key or by_key[row["row_key"]][0] < ts):
+                by_key[row["row_key"]] = (ts, None)
+    changes = {
+        table: {
+            "upserts": [row for _, row in by_key.values() if row is not None],
+            "deletes": [key for key, (_, row) in by_key.items() if row is None],
+        }
+        for table, by_key in events.items()
+    }
+    return {
+        "changes": changes,
+        "reset": since is None,
+        "next_token": encode_cursor([latest.isoformat()]),
+    }
+
+
+# --- Account ---
+async def account_delete(user_id: str):
+    """Delete a user and all their data in one transaction (RPC delete_user_account).
+
+    Falls back to account_delete_concurrent when the function is not installed.
+    """
+    await asyncio.gather(
+        _discard_buffered("analysis_entries", user_id),
+        _discard_buffered("batching_scripts", user_id),
+    )
+    try:
+        await _db().rpc("delete_user_account", {"p_user_id": user_id})
+    except APIError as e:
+        if e.code != "PGRST202":  # PostgREST: function not found
+            raise
+        await account_delete_concurrent(user_id)
+    _changed(ALL_TABLES, user_id)
+
+
+async def account_deleted_at(user_id: str) -> Optional[datetime]:
+    """When user_id's account was deleted, or None if it never was."""
+    rows = await _db().select("deleted_accounts", "deleted_at", eq={"user_id": user_id})
+    return _parse_ts(rows[0]["deleted_at"]) if rows else None
+
+
+async def account_delete_concurrent(user_id: str):
+    """Non-transactional fallback: independent per-table deletes in parallel, then the user row."""
+    await asyncio.gather(
+        session_delete_by_user(user_id),
+        creator_universe_delete_by_user(user_id),
+        analysis_delete_by_user(user_id),
+        schedule_delete_by_user(user_id),
+        story_finder_delete_by_user(user_id),
+        content_tips_delete_by_user(user_id),
+        batching_delete_by_user(user_id),
+        mission_delete_by_user(user_id),
+        sos_delete_by_user(user_id),
+    )
+    await user_delete(user_id)
+    await _db().upsert(
+        "deleted_accounts",
+        {"user_id": user_id, "deleted_at": _serialize_dt(datetime.now(timezone.utc))},
+        on_conflict="user_id",
+    )
 
 
 # --- Health ---
 async def db_ping() -> bool:
     try:
-        await _run(lambda: _sb_client().table("users").select("user_id").limit(1).execute())
+        await _db().select("users", "user_id", limit=1)
         return True
     except Exception:
         return False
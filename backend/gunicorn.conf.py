@@ -0,0 +1,53 @@
+"""
+Gunicorn settings for production serving (start.sh).
+Prefork: one master imports the app once (preload_app), then forks
+WEB_CONCURRENCY uvicorn workers that each run their own event loop.
+Per-worker clients, pools and background tasks are opened in the app's
+lifespan, never at import, so nothing loop- or socket-bound is shared
+across the fork.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+# Fixed default: cpu_count() in a container reports the host's cores
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+preload_app = os.environ.get("PRELOAD_APP", "1") == "1"
+
+# On SIGTERM, workers stop accepting, finish in-flight requests and run the
+# lifespan shutdown (write-buffer drain, pool close) within graceful_timeout
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.environ.get("WORKER_TIMEOUT", "60"))
+keepalive = int(os.environ.get("KEEPALIVE_SECONDS", "5"))
+
+# Recycle workers now and then; jitter keeps them from restarting together
+max_requests = int(os.environ.get("MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.environ.get("MAX_REQUESTS_JITTER", "0"))
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get("LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    """Refuse a multi-worker setup whose per-worker state would go stale.
+
+    Every worker keeps its own auth, response and ETag caches; they only
+    stay coherent when each worker hears the others' writes through the
+    Postgres invalidation bus. Buffered writes are visible only to the
+    worker holding them, so the write buffer is single-process only.
+    """
+    if server.cfg.workers <= 1:
+        return
+    problems = []
+    if not os.environ.get("DATABASE_URL"):
+        problems.append("DATABASE_URL is not set, so workers cannot evict each other's caches")
+    else:
+        try:
+            import asyncpg  # noqa: F401
+        except ImportError:
+            problems.append("asyncpg is not installed, so the cache invalidation bus cannot listen")
+    if float(os.environ.get("WRITE_COALESCE_MS", "0")) > 0:
+        problems.append("WRITE_COALESCE_MS buffers writes per worker; set it to 0")
+    if problems:
+        raise RuntimeError(f"Cannot run {server.cfg.workers} workers: " + "; ".join(problems))
@@ -0,0 +1,144 @@
+"""
+Cache invalidation bus for Universe backend.
+Writes publish (table, user_id) events; every subscriber evicts what it
+caches for that user. Events are delivered in process immediately and,
+when DATABASE_URL is set, also received from Postgres LISTEN/NOTIFY so
+that writes from other workers/instances (or straight to Supabase) evict
+this worker's caches too.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Callable, List, Optional
+
+try:
+    import asyncpg
+except ImportError:  # optional: without it the bus is process-local
+    asyncpg = None
+
+logger = logging.getLogger(__name__)
+
+# Must match the channel used by notify_cache_invalidation() in supabase_schema.sql
+CHANNEL = "cache_invalidation"
+
+# table for "every table of this user" (account deletion)
+ALL_TABLES = "*"
+
+# Called with (table, user_id); user_id None means "anything may have changed"
+Subscriber = Callable[[str, Optional[str]], None]
+
+
+class InvalidationBus:
+    """Fan-out of change events to cache-owning subscribers.
+
+    Remote events carry the database commit-side timestamp, so delivery lag
+    (database clock to this worker) is measured on every event. While the
+    listener is reconnecting events can be missed, so after every
+    (re)connect subscribers are told to drop everything (user_id None).
+    """
+
+    def __init__(self, reconnect_delay: float = 1.0, max_reconnect_delay: float = 30.0):
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._subscribers: List[Subscriber] = []
+        self._task: Optional[asyncio.Task] = None
+        self._conn = None
+        self.published = 0
+        self.received = 0
+        self.resets = 0
+        self.subscriber_errors = 0
+        self.connected = False
+        self.lag_ms_max = 0.0
+        self._lag_ms_total = 0.0
+
+    def subscribe(self, fn: Subscriber):
+        self._subscribers.append(fn)
+
+    def publish(self, table: str, user_id: Optional[str]):
+        """Deliver a local change to every subscriber now."""
+        self.published += 1
+        self._deliver(table, user_id)
+
+    def _deliver(self, table: str, user_id: Optional[str]):
+        for fn in self._subscribers:
+            try:
+                fn(table, user_id)
+            except Exception as e:
+                self.subscriber_errors += 1
+                logger.error(f"Invalidation subscriber {fn.__name__} failed for {table}/{user_id}: {e}")
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            event = json.loads(payload)
+            table, user_id = event["table"], event.get("user_id")
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring malformed invalidation payload {payload!r}: {e}")
+            return
+        self.received += 1
+        if "ts" in event:
+            lag = max(0.0, (time.time() - float(event["ts"])) * 1000)
+            self._lag_ms_total += lag
+            self.lag_ms_max = max(self.lag_ms_max, lag)
+        self._deliver(table, user_id)
+
+    def start(self, database_url: Optional[str]):
+        """Begin listening on Postgres (no-op without database_url or asyncpg)."""
+        if not database_url:
+            return
+        if asyncpg is None:
+            logger.warning("DATABASE_URL is set but asyncpg is not installed; cache invalidation stays process-local")
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen_loop(database_url))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen_loop(self, database_url: str):
+        delay = self.reconnect_delay
+        while True:
+            lost = asyncio.Event()
+            try:
+                self._conn = await asyncpg.connect(database_url)
+                self._conn.add_termination_listener(lambda _: lost.set())
+                await self._conn.add_listener(CHANNEL, self._on_notify)
+                self.connected = True
+                delay = self.reconnect_delay
+                # Anything written while we were not listening is unknown
+                self.resets += 1
+                self._deliver(ALL_TABLES, None)
+                await lost.wait()
+                logger.warning("Lost cache invalidation listener connection; reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cache invalidation listener failed: {e}")
+            finally:
+                self.connected = False
+                if self._conn is not None and not self._conn.is_closed():
+                    await self._conn.close()
+                self._conn = None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def stats(self) -> dict:
+        return {
+            "listening": self.connected,
+            "published": self.published,
+            "received": self.received,
+            "resets": self.resets,
+            "subscriber_errors": self.subscriber_errors,
+            "lag_ms_avg": round(self._lag_ms_total / self.received, 3) if self.received else 0.0,
+            "lag_ms_max": round(self.lag_ms_max, 3),
+        }
+
+
+# Process-wide bus: db.py publishes, cache owners subscribe
+bus = InvalidationBus()
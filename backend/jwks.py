@@ -0,0 +1,121 @@
+"""
+Local verification of Supabase-issued access tokens.
+The project's JWKS is cached in process and refreshed in the background.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+import httpx
+import jwt
+from jwt import PyJWK
+
+# Supabase signs with asymmetric keys; never accept HS* or "none" from a token header
+ALLOWED_ALGORITHMS = ("RS256", "ES256", "EdDSA")
+
+logger = logging.getLogger(__name__)
+
+
+def looks_like_jwt(token: str) -> bool:
+    """Cheap shape check so opaque session tokens skip JWT parsing."""
+    return token.startswith("eyJ") and token.count(".") == 2
+
+
+class JWKSCache:
+    """Signing keys by kid, refreshed every refresh_interval seconds.
+
+    An unknown kid (key rotation) forces an early refresh, rate limited to one
+    fetch per min_refresh_interval so bogus tokens cannot hammer the endpoint.
+    """
+
+    def __init__(
+        self,
+        jwks_url: str,
+        issuer: str,
+        audience: str = "authenticated",
+        refresh_interval: float = 600.0,
+        min_refresh_interval: float = 30.0,
+    ):
+        self.jwks_url = jwks_url
+        self.issuer = issuer
+        self.audience = audience
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self._keys: Dict[str, PyJWK] = {}
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    async def refresh(self, force: bool = False):
+        async with self._lock:
+            if not force and time.monotonic() - self._fetched_at < self.min_refresh_interval:
+                return
+            self._fetched_at = time.monotonic()
+            try:
+                async with httpx.AsyncClient(timeout=5.0) as client:
+                    r = await client.get(self.jwks_url)
+                    r.raise_for_status()
+                    jwks = r.json()
+            except Exception as e:
+                self.refresh_failures += 1
+                logger.error(f"Failed to fetch JWKS from {self.jwks_url}: {e}")
+                return
+            keys: Dict[str, PyJWK] = {}
+            for jwk in jwks.get("keys", []):
+                try:
+                    key = PyJWK(jwk)
+                except jwt.PyJWTError as e:
+                    logger.warning(f"Skipping unusable JWK {jwk.get('kid')}: {e}")
+                    continue
+                if key.key_id and key.algorithm_name in ALLOWED_ALGORITHMS:
+                    keys[key.key_id] = key
+            # Swap atomically; keys dropped upstream stop verifying immediately
+            self._keys = keys
+            self.refreshes += 1
+
+    async def verify(self, token: str) -> dict:
+        """Return the token's claims or raise jwt.InvalidTokenError."""
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = self._keys.get(kid)
+        if key is None:
+            await self.refresh()
+            key = self._keys.get(kid)
+            if key is None:
+                raise jwt.InvalidTokenError("Unknown signing key")
+        return jwt.decode(
+            token,
+            key.key,
+            algorithms=[key.algorithm_name],
+            audience=self.audience,
+            issuer=self.issuer,
+            options={"require": ["exp", "iat", "sub"]},
+        )
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refresh_loop(self):
+        # The first fetch is the caller's warm-up refresh(), before start()
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh(force=True)
+
+    def stats(self) -> dict:
+        return {
+            "keys": sorted(self._keys),
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+        }
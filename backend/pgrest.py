@@ -0,0 +1,138 @@
+"""
+Async PostgREST client for Universe backend.
+Talks to Supabase's REST endpoint over one pooled httpx client, so queries
+never leave the event loop.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import httpx
+from postgrest.exceptions import APIError
+
+Filter = Tuple[str, str, Any]  # (column, PostgREST operator, value)
+Order = Tuple[str, bool]  # (column, descending)
+
+
+def quote_value(value: Any) -> str:
+    """Filter value safe to embed in in.(...) lists and or=(...) expressions."""
+    s = filter_value(value)
+    if any(c in s for c in ',()."\\:') or s == "":
+        s = '"' + s.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return s
+
+
+def filter_value(value: Any, op: Optional[str] = None) -> str:
+    """Render a filter value the way PostgREST expects it in a query string."""
+    if op == "in":
+        return "(" + ",".join(quote_value(v) for v in value) + ")"
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def filters_from(eq: Optional[Dict[str, Any]], filters: Iterable[Filter]) -> List[Filter]:
+    out = [(k, "eq", v) for k, v in (eq or {}).items()]
+    out.extend(filters)
+    return out
+
+
+class AsyncPostgREST:
+    """Minimal PostgREST client mirroring the operations db.py needs.
+
+    Every method returns the decoded JSON rows (writes ask for
+    return=representation), matching what the supabase client puts in .data.
+    Errors are raised as postgrest APIError so both db backends fail the same way.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 10.0,
+        http2: bool = True,
+    ):
+        self._client = httpx.AsyncClient(
+            base_url=f"{url.rstrip('/')}/rest/v1",
+            headers={"apikey": key, "Authorization": f"Bearer {key}"},
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            timeout=timeout,
+            http2=http2,
+        )
+
+    async def select(
+        self,
+        table: str,
+        columns: str = "*",
+        eq: Optional[Dict[str, Any]] = None,
+        filters: Sequence[Filter] = (),
+        order: Sequence[Order] = (),
+        limit: Optional[int] = None,
+        or_: Optional[str] = None,
+    ) -> List[dict]:
+        params = [("select", columns)] + self._params(eq, filters)
+        # or_ is the body of or=(...), e.g. "a.lt.1,and(a.eq.1,b.lt.2)"
+        if or_:
+            params.append(("or", f"({or_})"))
+        if order:
+            params.append(("order", ",".join(f"{col}.{'desc' if desc else 'asc'}" for col, desc in order)))
+        if limit is not None:
+            params.append(("limit", str(limit)))
+        return await self._request("GET", f"/{table}", params=params)
+
+    async def insert(self, table: str, data: Any) -> List[dict]:
+        return await self._request("POST", f"/{table}", json=data, prefer="return=representation")
+
+    async def upsert(self, table: str, data: Any, on_conflict: str) -> List[dict]:
+        return await self._request(
+            "POST",
+            f"/{table}",
+            params=[("on_conflict", on_conflict)],
+            json=data,
+            prefer="resolution=merge-duplicates,return=representation",
+        )
+
+    async def update(
+        self, table: str, data: dict, eq: Optional[Dict[str, Any]] = None, filters: Sequence[Filter] = ()
+    ) -> List[dict]:
+        return await self._request(
+            "PATCH", f"/{table}", params=self._params(eq, filters), json=data, prefer="return=representation"
+        )
+
+    async def delete(
+        self, table: str, eq: Optional[Dict[str, Any]] = None, filters: Sequence[Filter] = ()
+    ) -> List[dict]:
+        return await self._request("DELETE", f"/{table}", params=self._params(eq, filters), prefer="return=representation")
+
+    async def rpc(self, fn: str, params: dict) -> Any:
+        return await self._request("POST", f"/rpc/{fn}", json=params)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    @staticmethod
+    def _params(eq: Optional[Dict[str, Any]], filters: Sequence[Filter]) -> List[Tuple[str, str]]:
+        return [(col, f"{op}.{filter_value(val, op)}") for col, op, val in filters_from(eq, filters)]
+
+    async def _request(self, method: str, path: str, params=None, json=None, prefer: Optional[str] = None) -> Any:
+        headers = {"Prefer": prefer} if prefer else None
+        r = await self._client.request(method, path, params=params, json=json, headers=headers)
+        if r.status_code >= 400:
+            try:
+                body = r.json()
+            except ValueError:
+                body = {"message": r.text}
+            if not isinstance(body, dict):
+                body = {"message": str(body)}
+            body.setdefault("code", str(r.status_code))
+            raise APIError(body)
+        if r.status_code == 204 or not r.content:
+            return []
+        return r.json()
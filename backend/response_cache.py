@@ -0,0 +1,115 @@
+"""
+Response cache for per-user GET routes.
+Entries are keyed by (user, route, query) and tagged per user and section,
+so a write evicts exactly the responses it can have changed.
+"""
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Protocol, Tuple
+
+from cache import TTLCache
+
+
+class ResponseCacheBackend(Protocol):
+    """Storage a ResponseCache can sit on (cache.TTLCache implements it)."""
+
+    def get(self, key: Hashable) -> Optional[Any]: ...
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[str] = (), ttl: Optional[float] = None): ...
+
+    def invalidate_tag(self, tag: str): ...
+
+    def clear(self): ...
+
+    def stats(self) -> dict: ...
+
+
+def create_backend(
+    name: str, max_entries: int, ttl: float, enabled: Optional[Callable[[], bool]] = None
+) -> Optional[ResponseCacheBackend]:
+    """Backend by RESPONSE_CACHE_BACKEND name; "none" disables caching."""
+    if name == "memory":
+        return TTLCache(max_entries=max_entries, ttl=ttl, enabled=enabled)
+    if name in ("none", "off", ""):
+        return None
+    raise ValueError(f"Unknown response cache backend: {name!r}")
+
+
+def user_tag(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def section_tag(user_id: str, section: str) -> str:
+    return f"user:{user_id}:{section}"
+
+
+# Stored in place of a loaded None, which backends use to mean "miss"
+_NONE = object()
+
+
+class ResponseCache:
+    """Read-through cache of route results.
+
+    Cached values are shared between requests and must be treated as read-only.
+    A load that overlaps an invalidation of its (user, section) is returned but
+    not stored, so a write can never be followed by a stale entry from a read
+    that raced it. Generations are only kept while loads are in flight.
+    """
+
+    def __init__(self, backend: Optional[ResponseCacheBackend]):
+        self.backend = backend
+        # (user_id, section) -> loads in flight / invalidations seen meanwhile
+        self._loading: Dict[Tuple[str, str], int] = {}
+        self._generations: Dict[Tuple[str, str], int] = {}
+        self.skipped_stores = 0
+
+    async def get_or_load(
+        self, user_id: str, section: str, key: Hashable, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        if self.backend is None:
+            return await loader()
+        cache_key = (user_id, section, key)
+        value = self.backend.get(cache_key)
+        if value is not None:
+            return None if value is _NONE else value
+        slot = (user_id, section)
+        self._loading[slot] = self._loading.get(slot, 0) + 1
+        generation = self._generations.get(slot, 0)
+        try:
+            value = await loader()
+            fresh = self._generations.get(slot, 0) == generation
+        finally:
+            self._loading[slot] -= 1
+            if not self._loading[slot]:
+                del self._loading[slot]
+                self._generations.pop(slot, None)
+        if fresh:
+            stored = _NONE if value is None else value
+            self.backend.set(cache_key, stored, tags=[user_tag(user_id), section_tag(user_id, section)])
+        else:
+            self.skipped_stores += 1
+        return value
+
+    def _bump(self, matches: Callable[[Tuple[str, str]], bool]):
+        for slot in self._loading:
+            if matches(slot):
+                self._generations[slot] = self._generations.get(slot, 0) + 1
+
+    def invalidate(self, user_id: str, *sections: str):
+        """Evict the user's cached responses for sections (all of them when none given)."""
+        if self.backend is None:
+            return
+        self._bump(lambda slot: slot[0] == user_id and (not sections or slot[1] in sections))
+        if not sections:
+            self.backend.invalidate_tag(user_tag(user_id))
+        for section in sections:
+            self.backend.invalidate_tag(section_tag(user_id, section))
+
+    def clear(self):
+        if self.backend is None:
+            return
+        self._bump(lambda slot: True)
+        self.backend.clear()
+
+    def stats(self) -> Optional[dict]:
+        if self.backend is None:
+            return None
+        return {**self.backend.stats(), "skipped_stores": self.skipped_stores}
@@ -1,29 +1,92 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Cookie, Response, Depends, Header
+from fastapi import FastAPI, APIRouter, HTTPException, Cookie, Request, Response, Depends, Header, Query
 from dotenv import load_dotenv
+from fastapi.responses import JSONResponse
 from starlette.middleware.cors import CORSMiddleware
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Union
+from pydantic import BaseModel, Field, ValidationError
+from typing import Any, List, Literal, Optional, Dict, Set, Tuple, Union
 import uuid
+import hashlib
+import asyncio
 from datetime import datetime, timezone, timedelta
+from contextlib import asynccontextmanager
 import httpx
+import jwt
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # Supabase (db.py loads and validates SUPABASE_URL, SUPABASE_SERVICE_KEY)
 import db as db_layer
+import invalidation
+from cache import Load, TTLCache
+from jwks import JWKSCache, looks_like_jwt
+from singleflight import SingleFlight
+from response_cache import ResponseCache, create_backend
+
+# Emergent Auth URL
+EMERGENT_AUTH_URL = "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data"
+
+# Supabase access tokens (auth.users identities) are verified locally against the project JWKS
+SUPABASE_JWT_AUTH = os.environ.get("SUPABASE_JWT_AUTH", "1") == "1"
+SUPABASE_AUTH_URL = f"{db_layer.SUPABASE_URL.rstrip('/')}/auth/v1"
+supabase_jwks = JWKSCache(
+    jwks_url=os.environ.get("SUPABASE_JWKS_URL", f"{SUPABASE_AUTH_URL}/.well-known/jwks.json"),
+    issuer=SUPABASE_AUTH_URL,
+    refresh_interval=float(os.environ.get("SUPABASE_JWKS_REFRESH_SECONDS", "600")),
+)
+
+# App-lifetime client for Emergent Auth (keep-alive + HTTP/2), opened in lifespan
+auth_http_client: Optional[httpx.AsyncClient] = None
+
+# Concurrent exchanges of the same session_id (mobile retries) share one login
+session_exchanges = SingleFlight()
+
+# Sessions a user may keep across devices; 0 or 1 logs out other devices on login
+MAX_DEVICE_SESSIONS = int(os.environ.get("MAX_DEVICE_SESSIONS", "0"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global auth_http_client
+    auth_http_client = httpx.AsyncClient(
+        http2=True,
+        timeout=10.0,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60.0),
+    )
+    # Runs in each worker after the fork: open pools here, never at import
+    warmups = [db_layer.init()]
+    if SUPABASE_JWT_AUTH:
+        warmups.append(supabase_jwks.refresh(force=True))
+    db_ready, *_ = await asyncio.gather(*warmups)
+    if not db_ready:
+        logging.warning("Database warm-up ping failed; serving anyway")
+    if SUPABASE_JWT_AUTH:
+        supabase_jwks.start()
+    # Direct (not pooled) Postgres connection for LISTEN; unset keeps invalidation in-process
+    invalidation.bus.start(os.environ.get("DATABASE_URL"))
+    yield
+    await invalidation.bus.stop()
+    await supabase_jwks.stop()
+    await auth_http_client.aclose()
+    await db_layer.close()
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Emergent Auth URL
-EMERGENT_AUTH_URL = "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data"
+@app.exception_handler(db_layer.DBOverloaded)
+async def db_overloaded_handler(request, exc: db_layer.DBOverloaded):
+    """Shed load instead of piling requests onto a saturated db executor"""
+    logging.warning(f"Rejecting request: {exc}")
+    return JSONResponse(status_code=503, content={"detail": "Database busy, please retry"}, headers={"Retry-After": "1"})
+
+@app.exception_handler(db_layer.InvalidCursor)
+async def invalid_cursor_handler(request, exc: db_layer.InvalidCursor):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
 
 # ==================== PYDANTIC MODELS ====================
 
@@ -161,6 +224,161 @@ class StoryFinderRow(BaseModel):
 class UpdateStoryFinderRequest(BaseModel):
     rows: List[StoryFinderRow]
 
+class StoryFinderRowRequest(BaseModel):
+    problem: str = ""
+    pursuit: str = ""
+    payoff: str = ""
+    your_story: str = ""
+
+class MoveStoryFinderRowRequest(BaseModel):
+    position: int = Field(..., ge=0)
+
+class SyncMutation(BaseModel):
+    idempotency_key: str = Field(..., min_length=1, max_length=200)
+    entity: Literal["script", "analysis_entry", "story_finder_row", "schedule"]
+    op: Literal["upsert", "delete"]
+    id: Optional[str] = None  # row id; unused for schedule
+    data: Optional[Dict[str, Any]] = None  # the Script / AnalysisEntry / StoryFinderRow, or {"schedule": ...}
+
+class SyncPushRequest(BaseModel):
+    mutations: List[SyncMutation] = Field(..., max_length=500)
+
+def default_creator_universe(user_id: str) -> CreatorUniverse:
+    """Starting Creator's Universe for a new user"""
+    return CreatorUniverse(
+        user_id=user_id,
+        overarching_goal="",
+        content_pillars=[
+            {"title": "Content Pillar 1", "ideas": []},
+            {"title": "Content Pillar 2", "ideas": []},
+            {"title": "Content Pillar 3", "ideas": []},
+            {"title": "Content Pillar 4", "ideas": []}
+        ],
+        avatar=None,
+        identity=None,
+        updated_at=datetime.now(timezone.utc)
+    )
+
+# Page size for the keyset-paginated list endpoints
+MAX_PAGE_SIZE = 100
+
+# Same limit as frontend/constants/limits.ts
+MAX_STORY_CARDS = 100
+
+# Current ETag of each per-user singleton document, keyed by (user_id, doc).
+# Lets a matching If-None-Match be answered with 304 without reading the row;
+# writes in this process refresh it and the invalidation bus evicts it on
+# writes from elsewhere (the frontend writes straight to Supabase too).
+# Like every per-user cache here it is bypassed unless the bus is listening
+# on Postgres (DATABASE_URL), since otherwise those writes go unheard.
+doc_etags = TTLCache(
+    max_entries=int(os.environ.get("ETAG_CACHE_MAX_ENTRIES", "30000")),
+    ttl=float(os.environ.get("ETAG_CACHE_TTL_SECONDS", "30")),
+    enabled=lambda: invalidation.bus.connected,
+)
+
+# Results of the per-user GET routes, keyed by (user, section, query) and
+# evicted by section through the invalidation bus (RESPONSE_CACHE_BACKEND=none disables)
+response_cache = ResponseCache(create_backend(
+    os.environ.get("RESPONSE_CACHE_BACKEND", "memory"),
+    max_entries=int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "20000")),
+    ttl=float(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", "30")),
+    enabled=lambda: invalidation.bus.connected,
+))
+
+def default_schedule(user_id: str) -> dict:
+    """Empty weekly schedule for a new user"""
+    return {
+        "user_id": user_id,
+        "schedule": {
+            "Monday": {"idea": "", "format": ""},
+            "Tuesday": {"idea": "", "format": ""},
+            "Wednesday": {"idea": "", "format": ""},
+            "Thursday": {"idea": "", "format": ""},
+            "Friday": {"idea": "", "format": ""},
+            "Saturday": {"idea": "", "format": ""},
+            "Sunday": {"idea": "", "format": ""},
+        },
+        "updated_at": datetime.now(timezone.utc)
+    }
+
+# ==================== CONDITIONAL GET HELPERS ====================
+
+def doc_etag(doc: dict) -> str:
+    """Strong ETag from the row's updated_at and version"""
+    updated_at = doc.get("updated_at")
+    if isinstance(updated_at, datetime):
+        updated_at = updated_at.isoformat()
+    digest = hashlib.sha1(f"{updated_at}:{doc.get('version', 0)}".encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+def doc_tag(user_id: str, kind: str) -> str:
+    return f"{db_layer.user_cache_tag(user_id)}:{kind}"
+
+def remember_etag(user_id: str, kind: str, doc: Optional[dict], load: Optional[Load] = None) -> Optional[str]:
+    """Record (and return) the current ETag of a user's document.
+    
+    Reads pass their doc_etags.loading() so an ETag read before a racing
+    write's eviction is not put back; writes record theirs directly.
+    """
+    if not doc:
+        doc_etags.delete((user_id, kind))
+        return None
+    etag = doc_etag(doc)
+    (load or doc_etags).set((user_id, kind), etag, tags=[db_layer.user_cache_tag(user_id), doc_tag(user_id, kind)])
+    return etag
+
+async def load_document(user_id: str, kind: str, loader) -> Tuple[Optional[dict], Optional[str]]:
+    """(document, ETag) from loader(), remembering the ETag unless a write raced the read"""
+    with doc_etags.loading() as load:
+        doc = await loader()
+        return doc, remember_etag(user_id, kind, doc, load)
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    if not if_none_match or not etag:
+        return False
+    candidates = [t.strip() for t in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+def not_modified(etag: str) -> Response:
+    """304 with no body; skips JSON serialization entirely"""
+    return Response(status_code=304, headers={"ETag": etag})
+
+# ==================== RESPONSE CACHE HELPERS ====================
+
+async def cached(user_id: str, section: str, loader, key=None):
+    """loader() through the response cache; the result must not be mutated"""
+    return await response_cache.get_or_load(user_id, section, key, loader)
+
+# ==================== CACHE INVALIDATION ====================
+
+# Response cache section (and ETag'd document) a change to each table affects
+TABLE_SECTIONS = {
+    "creator_universe": "creator_universe",
+    "schedule": "schedule",
+    "story_finder": "story_finder",
+    "content_tips_progress": "content_tips",
+    "analysis_entries": "analysis",
+    "batching_scripts": "batching",
+    "sos_completions": "sos",
+}
+ETAG_DOCS = ("creator_universe", "schedule", "story_finder")
+
+def evict_user_caches(table: str, user_id: Optional[str]):
+    """Invalidation bus subscriber: drop this worker's cached state a write made stale"""
+    if user_id is None:
+        doc_etags.clear()
+        response_cache.clear()
+    elif table == invalidation.ALL_TABLES:
+        doc_etags.invalidate_tag(db_layer.user_cache_tag(user_id))
+        response_cache.invalidate(user_id)
+    elif table in TABLE_SECTIONS:
+        if table in ETAG_DOCS:
+            doc_etags.invalidate_tag(doc_tag(user_id, table))
+        response_cache.invalidate(user_id, TABLE_SECTIONS[table])
+
+invalidation.bus.subscribe(evict_user_caches)
+
 # ==================== AUTH HELPERS ====================
 
 async def get_current_user(
@@ -178,27 +396,119 @@ async def get_current_user(
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    # Find session in database
-    session = await db_layer.session_find_by_token(token)
-    
-    if not session:
-        raise HTTPException(status_code=401, detail="Invalid session")
-    
-    # Check if session is expired (timezone-aware comparison)
-    expires_at = session["expires_at"]
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
-    
-    if expires_at < datetime.now(timezone.utc):
+    # Resolved sessions are cached briefly; db writes to the user evict them
+    cached = db_layer.auth_cache.get(token)
+    if cached is not None:
+        expires_at, user = cached
+        if expires_at < datetime.now(timezone.utc):
+            db_layer.auth_cache.delete(token)
+            raise HTTPException(status_code=401, detail="Session expired")
+        return user
+    
+    # Supabase access tokens never touch user_sessions
+    if SUPABASE_JWT_AUTH and looks_like_jwt(token):
+        return await get_user_from_access_token(token)
+    
+    # Find unexpired session and its user in one query; a logout or user
+    # update racing the read keeps its result out of the cache
+    with db_layer.auth_cache.loading() as load:
+        found = await db_layer.session_user_find_by_token(token)
+        
+        if not found:
+            raise HTTPException(status_code=401, detail="Invalid session")
+        
+        session, user_doc = found
+        expires_at = session["expires_at"]
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        
+        user = User(**user_doc)
+        load.set(token, (expires_at, user), tags=[db_layer.user_cache_tag(user.user_id)])
+    return user
+
+async def get_user_from_access_token(token: str) -> User:
+    """Verify a Supabase access token locally and resolve its user"""
+    try:
+        claims = await supabase_jwks.verify(token)
+    except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Session expired")
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid session")
     
-    # Get user from database
-    user_doc = await db_layer.user_find_by_id(session["user_id"])
-    
-    if not user_doc:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    return User(**user_doc)
+    user_id = claims["sub"]
+    tag = db_layer.user_cache_tag(user_id)
+    
+    expires_at = datetime.fromtimestamp(claims["exp"], timezone.utc)
+    
+    # Access tokens rotate hourly; keep the user doc cached across them
+    user = db_layer.auth_cache.get(("user", user_id))
+    if user is not None:
+        db_layer.auth_cache.set(token, (expires_at, user), tags=[tag])
+        return user
+    
+    with db_layer.auth_cache.loading() as load:
+        user_doc = await db_layer.user_find_by_id(user_id)
+        if not user_doc:
+            user_doc = await create_user_from_claims(claims)
+        user = User(**user_doc)
+        load.set(("user", user_id), user, tags=[tag])
+        load.set(token, (expires_at, user), tags=[tag])
+    return user
+
+def signed_in_at(claims: dict) -> datetime:
+    """When the token's session signed in; unlike iat it survives token refreshes"""
+    times = [a["timestamp"] for a in claims.get("amr") or [] if isinstance(a, dict) and "timestamp" in a]
+    return datetime.fromtimestamp(max(times) if times else claims["iat"], timezone.utc)
+
+async def create_user_from_claims(claims: dict) -> dict:
+    """First request from an auth.users identity: create its users row"""
+    meta = claims.get("user_metadata") or {}
+    email = claims.get("email") or meta.get("email")
+    if not email:
+        raise HTTPException(status_code=401, detail="Access token has no email")
+    
+    # Sessions from before DELETE /auth/account must not bring the account back
+    deleted_at = await db_layer.account_deleted_at(claims["sub"])
+    if deleted_at and signed_in_at(claims) <= deleted_at:
+        raise HTTPException(status_code=401, detail="Account deleted")
+    
+    user = User(
+        user_id=claims["sub"],
+        email=email,
+        name=meta.get("full_name") or meta.get("name") or "User",
+        picture=meta.get("avatar_url"),
+        streak=0,
+        coins=0,
+        current_planet=0,
+        created_at=datetime.now(timezone.utc)
+    )
+    try:
+        await db_layer.user_insert(user.model_dump())
+    except db_layer.UserExists:
+        # Concurrent first requests race on the insert; the winner's row is fine
+        existing = await db_layer.user_find_by_id(user.user_id)
+        if existing:
+            return existing
+        # Otherwise the email belongs to another account (e.g. an Emergent login)
+        raise HTTPException(
+            status_code=409,
+            detail="An account with this email already exists. Sign in the way you did before."
+        )
+    await db_layer.creator_universe_insert(default_creator_universe(user.user_id).model_dump())
+    return user.model_dump()
+
+# ==================== QUERY HELPERS ====================
+
+def parse_fields(fields: Optional[str], model: type) -> Optional[List[str]]:
+    """Validate a ?fields=a,b sparse fieldset against model; None means all fields"""
+    if fields is None:
+        return None
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in names if f not in model.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    # id is always returned
+    return [f for f in names if f != "id"]
 
 # ==================== AUTH ROUTES ====================
 
@@ -206,26 +516,43 @@ async def get_current_user(
 async def exchange_session(session_id: str, response: Response):
     """Exchange session_id for user data and session_token"""
     
+    login = await session_exchanges.do(session_id, lambda: login_with_session_id(session_id))
+    
+    # Set cookie
+    response.set_cookie(
+        key="session_token",
+        value=login.session_token,
+        httponly=True,
+        secure=True,
+        samesite="none",
+        max_age=7 * 24 * 60 * 60,  # 7 days
+        path="/"
+    )
+    
+    return login
+
+async def login_with_session_id(session_id: str) -> LoginResponse:
+    """Emergent Auth exchange plus user/session writes; run once per in-flight session_id"""
+    
     try:
         # Call Emergent Auth API
-        async with httpx.AsyncClient() as client:
-            try:
-                auth_response = await client.get(
-                    EMERGENT_AUTH_URL,
-                    headers={"X-Session-ID": session_id},
-                    timeout=10.0
-                )
-                auth_response.raise_for_status()
-                user_data = auth_response.json()
-            except httpx.HTTPStatusError as e:
-                logging.error(f"Emergent Auth API returned error: {e.response.status_code} - {e.response.text}")
-                raise HTTPException(status_code=400, detail=f"Invalid session_id: Auth API returned {e.response.status_code}")
-            except httpx.RequestError as e:
-                logging.error(f"Failed to connect to Emergent Auth API: {e}")
-                raise HTTPException(status_code=503, detail="Auth service unavailable")
-            except Exception as e:
-                logging.error(f"Unexpected error calling Emergent Auth API: {e}")
-                raise HTTPException(status_code=400, detail="Invalid session_id")
+        try:
+            auth_response = await auth_http_client.get(
+                EMERGENT_AUTH_URL,
+                headers={"X-Session-ID": session_id},
+                timeout=10.0
+            )
+            auth_response.raise_for_status()
+            user_data = auth_response.json()
+        except httpx.HTTPStatusError as e:
+            logging.error(f"Emergent Auth API returned error: {e.response.status_code} - {e.response.text}")
+            raise HTTPException(status_code=400, detail=f"Invalid session_id: Auth API returned {e.response.status_code}")
+        except httpx.RequestError as e:
+            logging.error(f"Failed to connect to Emergent Auth API: {e}")
+            raise HTTPException(status_code=503, detail="Auth service unavailable")
+        except Exception as e:
+            logging.error(f"Unexpected error calling Emergent Auth API: {e}")
+            raise HTTPException(status_code=400, detail="Invalid session_id")
         
         # Parse response
         try:
@@ -240,86 +567,23 @@ async def exchange_session(session_id: str, response: Response):
         logging.error(f"Unexpected error in auth exchange: {e}")
         raise HTTPException(status_code=500, detail=f"Auth exchange error: {str(e)}")
     
-    # Database operations with error handling
+    # User find-or-create, default universe and session rotation in one transaction
     try:
-        # Check if user exists
-        existing_user = await db_layer.user_find_by_email(session_data.email)
-        
-        if existing_user:
-            try:
-                user = User(**existing_user)
-            except Exception as e:
-                logging.error(f"Failed to parse existing user: {e}, data: {existing_user}")
-                raise HTTPException(status_code=500, detail=f"Failed to parse user data: {str(e)}")
-        else:
-            # Create new user (map id to user_id)
-            try:
-                user_id = f"user_{uuid.uuid4().hex[:12]}"
-                user = User(
-                    user_id=user_id,
-                    email=session_data.email,
-                    name=session_data.name,
-                    picture=session_data.picture,
-                    streak=0,
-                    coins=0,
-                    current_planet=0,
-                    created_at=datetime.now(timezone.utc)
-                )
-                
-                await db_layer.user_insert(user.model_dump())
-                
-                # Initialize Creator's Universe
-                creator_universe = CreatorUniverse(
-                    user_id=user_id,
-                    overarching_goal="",
-                    content_pillars=[
-                        {"title": "Content Pillar 1", "ideas": []},
-                        {"title": "Content Pillar 2", "ideas": []},
-                        {"title": "Content Pillar 3", "ideas": []},
-                        {"title": "Content Pillar 4", "ideas": []}
-                    ],
-                    avatar=None,
-                    identity=None,
-                    updated_at=datetime.now(timezone.utc)
-                )
-                await db_layer.creator_universe_insert(creator_universe.model_dump())
-            except Exception as e:
-                logging.error(f"Failed to create new user: {e}")
-                raise HTTPException(status_code=500, detail=f"Failed to create user: {str(e)}")
-        
-        # Create or update session
-        try:
-            await db_layer.session_delete_by_user(user.user_id)
-            
-            session = UserSession(
-                user_id=user.user_id,
-                session_token=session_data.session_token,
-                expires_at=datetime.now(timezone.utc) + timedelta(days=7),
-                created_at=datetime.now(timezone.utc)
-            )
-            
-            await db_layer.session_insert(session.model_dump())
-        except Exception as e:
-            logging.error(f"Failed to create session: {e}")
-            raise HTTPException(status_code=500, detail=f"Failed to create session: {str(e)}")
-    except HTTPException:
-        # Re-raise HTTP exceptions
-        raise
+        user_doc, _ = await db_layer.user_login(
+            user_id=f"user_{uuid.uuid4().hex[:12]}",
+            email=session_data.email,
+            name=session_data.name,
+            picture=session_data.picture,
+            session_token=session_data.session_token,
+            expires_at=datetime.now(timezone.utc) + timedelta(days=7),
+            content_pillars=default_creator_universe("").content_pillars,
+            max_sessions=MAX_DEVICE_SESSIONS,
+        )
+        user = User(**user_doc)
     except Exception as e:
         logging.error(f"Database error in exchange_session: {e}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     
-    # Set cookie
-    response.set_cookie(
-        key="session_token",
-        value=session_data.session_token,
-        httponly=True,
-        secure=True,
-        samesite="none",
-        max_age=7 * 24 * 60 * 60,  # 7 days
-        path="/"
-    )
-    
     return LoginResponse(user=user, session_token=session_data.session_token)
 
 @api_router.get("/auth/me", response_model=User)
@@ -343,17 +607,8 @@ async def delete_account(
     """Permanently delete user account and all associated data"""
     user_id = current_user.user_id
 
-    # Delete all user data across tables
-    await db_layer.session_delete_by_user(user_id)
-    await db_layer.creator_universe_delete_by_user(user_id)
-    await db_layer.analysis_delete_by_user(user_id)
-    await db_layer.schedule_delete_by_user(user_id)
-    await db_layer.story_finder_delete_by_user(user_id)
-    await db_layer.content_tips_delete_by_user(user_id)
-    await db_layer.batching_delete_by_user(user_id)
-    await db_layer.mission_delete_by_user(user_id)
-    await db_layer.sos_delete_by_user(user_id)
-    await db_layer.user_delete(user_id)
+    # Delete all user data across tables in one transaction
+    await db_layer.account_delete(user_id)
 
     response.delete_cookie(key="session_token", path="/")
     return {"message": "Account deleted successfully"}
@@ -376,52 +631,19 @@ async def complete_mission(
     """Mark daily mission as complete"""
     
     today = request.date
+    try:
+        datetime.strptime(today, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="date must be YYYY-MM-DD")
     
-    # Check if mission already completed today
-    existing_mission = await db_layer.mission_find(current_user.user_id, today)
+    # Mission upsert, streak, planet and coins in one transaction
+    already_completed, updated_user = await db_layer.mission_complete(current_user.user_id, today, 10)
     
-    if existing_mission and existing_mission.get("completed"):
+    if already_completed:
         raise HTTPException(status_code=400, detail="Mission already completed today")
     
-    # Mark mission complete
-    if existing_mission:
-        await db_layer.mission_update_completed(current_user.user_id, today)
-    else:
-        mission = Mission(
-            user_id=current_user.user_id,
-            date=today,
-            completed=True,
-            created_at=datetime.now(timezone.utc)
-        )
-        await db_layer.mission_upsert(mission.model_dump())
-    
-    # Update user progress
-    update_data = {
-        "coins": current_user.coins + 10,
-        "current_planet": current_user.current_planet + 1,
-        "last_post_date": today
-    }
-    
-    # Update streak
-    if current_user.last_post_date:
-        last_date = datetime.fromisoformat(current_user.last_post_date)
-        today_date = datetime.fromisoformat(today)
-        days_diff = (today_date - last_date).days
-        
-        if days_diff == 1:
-            # Consecutive day
-            update_data["streak"] = current_user.streak + 1
-        elif days_diff > 1:
-            # Streak broken
-            update_data["streak"] = 1
-    else:
-        # First post
-        update_data["streak"] = 1
-    
-    await db_layer.user_update(current_user.user_id, update_data)
-    
-    # Get updated user
-    updated_user = await db_layer.user_find_by_id(current_user.user_id)
+    if not updated_user:
+        raise HTTPException(status_code=404, detail="User not found")
     
     return {
         "message": "Mission completed!",
@@ -429,19 +651,23 @@ async def complete_mission(
         "user": User(**updated_user)
     }
 
-@api_router.get("/mission/today")
-async def get_today_mission(current_user: User = Depends(get_current_user)):
-    """Get today's mission status"""
+async def load_today_mission(user_id: str) -> dict:
+    """Today's (UTC) mission status"""
     
     today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
     
-    mission = await db_layer.mission_find(current_user.user_id, today)
+    mission = await db_layer.mission_find(user_id, today)
     
     if mission:
         return {"completed": mission.get("completed", False), "date": today}
     
     return {"completed": False, "date": today}
 
+@api_router.get("/mission/today")
+async def get_today_mission(current_user: User = Depends(get_current_user)):
+    """Get today's mission status"""
+    return await load_today_mission(current_user.user_id)
+
 # ==================== SOS ROUTES ====================
 
 @api_router.post("/sos/complete")
@@ -462,11 +688,8 @@ async def complete_sos(
     
     await db_layer.sos_insert(sos_completion.model_dump())
     
-    # Award coins
-    await db_layer.user_increment_coins(current_user.user_id, 10)
-    
-    # Get updated user
-    updated_user = await db_layer.user_find_by_id(current_user.user_id)
+    # Award coins; returns the updated user
+    updated_user = await db_layer.user_increment_coins(current_user.user_id, 10)
     
     return {
         "message": "SOS completed! You've earned 10 coins.",
@@ -475,38 +698,56 @@ async def complete_sos(
     }
 
 @api_router.get("/sos/history")
-async def get_sos_history(current_user: User = Depends(get_current_user)):
-    """Get user's SOS completion history"""
+async def get_sos_history(
+    fields: Optional[str] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Get user's SOS completion history, newest first (pass next_cursor back as ?cursor=)"""
+    
+    user_id = current_user.user_id
+    wanted = parse_fields(fields, SOSCompletion)
     
-    history = await db_layer.sos_list(current_user.user_id, 100)
+    async def load():
+        history, next_cursor = await db_layer.sos_page(user_id, limit, cursor, fields=wanted)
+        return {"history": history, "next_cursor": next_cursor}
     
-    return {"history": history}
+    return await cached(user_id, "sos", load, key=(fields, limit, cursor))
 
 # ==================== CREATOR'S UNIVERSE ROUTES ====================
 
-@api_router.get("/creator-universe")
-async def get_creator_universe(current_user: User = Depends(get_current_user)):
-    """Get user's creator universe"""
-    
-    universe = await db_layer.creator_universe_find(current_user.user_id)
+async def load_creator_universe(user_id: str) -> dict:
+    """User's creator universe, creating the default on first read"""
+    universe = await db_layer.creator_universe_find(user_id)
     
     if not universe:
         # Create default
-        universe = CreatorUniverse(
-            user_id=current_user.user_id,
-            overarching_goal="",
-            content_pillars=[
-                {"title": "Content Pillar 1", "ideas": []},
-                {"title": "Content Pillar 2", "ideas": []},
-                {"title": "Content Pillar 3", "ideas": []},
-                {"title": "Content Pillar 4", "ideas": []}
-            ],
-            avatar=None,
-            identity=None,
-            updated_at=datetime.now(timezone.utc)
-        )
-        await db_layer.creator_universe_insert(universe.model_dump())
+        default = default_creator_universe(user_id).model_dump()
+        universe = await db_layer.creator_universe_insert(default) or default
+    
+    return universe
+
+async def load_creator_universe_cached(user_id: str) -> dict:
+    return await cached(user_id, "creator_universe", lambda: load_creator_universe(user_id))
+
+@api_router.get("/creator-universe")
+async def get_creator_universe(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user)
+):
+    """Get user's creator universe (supports If-None-Match)"""
+    
+    cached_etag = doc_etags.get((current_user.user_id, "creator_universe"))
+    if etag_matches(if_none_match, cached_etag):
+        return not_modified(cached_etag)
     
+    user_id = current_user.user_id
+    universe, etag = await load_document(user_id, "creator_universe", lambda: load_creator_universe_cached(user_id))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
     return universe
 
 @api_router.put("/creator-universe")
@@ -530,22 +771,87 @@ async def update_creator_universe(
     if request.identity is not None:
         update_data["identity"] = request.identity
     
-    await db_layer.creator_universe_update(current_user.user_id, update_data)
+    # Returns the updated universe
+    universe = await db_layer.creator_universe_update(current_user.user_id, update_data)
+    remember_etag(current_user.user_id, "creator_universe", universe)
+    
+    return universe
+
+# Top-level members a creator universe patch may touch
+PATCHABLE_UNIVERSE_FIELDS = set(UpdateCreatorUniverseRequest.model_fields)
+
+@api_router.patch("/creator-universe")
+async def patch_creator_universe(
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """Partially update creator universe.
     
-    # Get updated universe
-    universe = await db_layer.creator_universe_find(current_user.user_id)
+    Send an RFC 7386 merge patch (application/merge-patch+json, a JSON object)
+    or RFC 6902 operations (application/json-patch+json, a JSON array), e.g.
+    [{"op": "add", "path": "/content_pillars/0/ideas/-", "value": "New idea"}].
+    All six RFC 6902 ops are supported; a missing path or an array index past
+    the end is a 422. The patch is applied in the database, so only the edit
+    is sent and parsed.
+    """
+    
+    try:
+        patch = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body must be JSON")
+    
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    merge, ops = None, None
+    if isinstance(patch, list) and content_type != "application/merge-patch+json":
+        ops = patch
+        if any(not isinstance(op, dict) or not isinstance(op.get("path"), str) for op in ops):
+            raise HTTPException(status_code=422, detail="Every JSON Patch operation needs a string path")
+        # move/copy read from "from", so it must name a patchable field too
+        pointers = [p for op in ops for p in (op["path"], op.get("from")) if isinstance(p, str)]
+        fields = {p.split("/")[1] for p in pointers if p.startswith("/")}
+    elif isinstance(patch, dict) and content_type != "application/json-patch+json":
+        merge = patch
+        fields = set(patch)
+    else:
+        raise HTTPException(status_code=422, detail="Patch must be a merge patch object or a JSON Patch array")
+    
+    unknown = fields - PATCHABLE_UNIVERSE_FIELDS
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    
+    user_id = current_user.user_id
+    try:
+        universe = await db_layer.creator_universe_patch(user_id, merge=merge, ops=ops)
+        if universe is None:
+            # Never read yet: create the default, then patch it
+            await load_creator_universe(user_id)
+            universe = await db_layer.creator_universe_patch(user_id, merge=merge, ops=ops)
+    except db_layer.InvalidPatch as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    remember_etag(user_id, "creator_universe", universe)
     
     return universe
 
 # ==================== ANALYSIS ROUTES ====================
 
 @api_router.get("/analysis/entries")
-async def get_analysis_entries(current_user: User = Depends(get_current_user)):
-    """Get user's analysis entries"""
+async def get_analysis_entries(
+    fields: Optional[str] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Get user's analysis entries, newest first (?fields=title,date for a sparse fieldset)"""
     
-    entries = await db_layer.analysis_list(current_user.user_id, 100)
+    user_id = current_user.user_id
+    wanted = parse_fields(fields, AnalysisEntry)
+    
+    async def load():
+        entries, next_cursor = await db_layer.analysis_page(user_id, limit, cursor, fields=wanted)
+        return {"entries": entries, "next_cursor": next_cursor}
     
-    return {"entries": entries}
+    return await cached(user_id, "analysis", load, key=(fields, limit, cursor))
 
 @api_router.post("/analysis/entries")
 async def save_analysis_entry(
@@ -577,32 +883,39 @@ async def delete_analysis_entry(
 
 # ==================== SCHEDULE ROUTES ====================
 
-@api_router.get("/schedule")
-async def get_schedule(current_user: User = Depends(get_current_user)):
-    """Get user's schedule data"""
-    
-    schedule = await db_layer.schedule_find(current_user.user_id)
+async def load_schedule(user_id: str) -> dict:
+    """User's schedule, creating the default on first read"""
+    schedule = await db_layer.schedule_find(user_id)
     
     if not schedule:
         # Create default
-        default_schedule = {
-            "user_id": current_user.user_id,
-            "schedule": {
-                "Monday": {"idea": "", "format": ""},
-                "Tuesday": {"idea": "", "format": ""},
-                "Wednesday": {"idea": "", "format": ""},
-                "Thursday": {"idea": "", "format": ""},
-                "Friday": {"idea": "", "format": ""},
-                "Saturday": {"idea": "", "format": ""},
-                "Sunday": {"idea": "", "format": ""},
-            },
-            "updated_at": datetime.now(timezone.utc)
-        }
-        await db_layer.schedule_insert(default_schedule)
-        return default_schedule
+        default = default_schedule(user_id)
+        schedule = await db_layer.schedule_insert(default) or default
     
     return schedule
 
+async def load_schedule_cached(user_id: str) -> dict:
+    return await cached(user_id, "schedule", lambda: load_schedule(user_id))
+
+@api_router.get("/schedule")
+async def get_schedule(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user)
+):
+    """Get user's schedule data (supports If-None-Match)"""
+    
+    cached_etag = doc_etags.get((current_user.user_id, "schedule"))
+    if etag_matches(if_none_match, cached_etag):
+        return not_modified(cached_etag)
+    
+    user_id = current_user.user_id
+    schedule, etag = await load_document(user_id, "schedule", lambda: load_schedule_cached(user_id))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    return schedule
+
 @api_router.put("/schedule")
 async def update_schedule(
     request: UpdateScheduleRequest,
@@ -619,19 +932,33 @@ async def update_schedule(
         "user_id": current_user.user_id,
         **update_data
     }
-    await db_layer.schedule_upsert(schedule_data)
-    
-    # Get updated schedule
-    schedule = await db_layer.schedule_find(current_user.user_id)
+    # Returns the updated schedule
+    schedule = await db_layer.schedule_upsert(schedule_data)
+    remember_etag(current_user.user_id, "schedule", schedule)
     
     return schedule
 
 # ==================== STORY FINDER ROUTES ====================
 
+async def load_story_finder_doc(user_id: str) -> Optional[dict]:
+    return await cached(user_id, "story_finder", lambda: db_layer.story_finder_find(user_id))
+
 @api_router.get("/story-finder")
-async def get_story_finder(current_user: User = Depends(get_current_user)):
-    """Get user's Story Finder rows"""
-    doc = await db_layer.story_finder_find(current_user.user_id)
+async def get_story_finder(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user)
+):
+    """Get user's Story Finder rows (supports If-None-Match)"""
+    cached_etag = doc_etags.get((current_user.user_id, "story_finder"))
+    if etag_matches(if_none_match, cached_etag):
+        return not_modified(cached_etag)
+    user_id = current_user.user_id
+    doc, etag = await load_document(user_id, "story_finder", lambda: load_story_finder_doc(user_id))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    if etag:
+        response.headers["ETag"] = etag
     if not doc or "rows" not in doc:
         return {"rows": []}
     return {"rows": doc["rows"]}
@@ -643,9 +970,54 @@ async def update_story_finder(
 ):
     """Update Story Finder rows"""
     rows = [r.model_dump() for r in request.rows]
-    await db_layer.story_finder_upsert(current_user.user_id, rows, datetime.now(timezone.utc))
+    doc = await db_layer.story_finder_upsert(current_user.user_id, rows, datetime.now(timezone.utc))
+    remember_etag(current_user.user_id, "story_finder", doc)
     return {"rows": rows}
 
+def story_finder_row_edited(user_id: str, result: dict):
+    """Track the document's new ETag from a row edit's {updated_at, version}"""
+    remember_etag(user_id, "story_finder", result)
+
+@api_router.put("/story-finder/rows/{row_id}")
+async def upsert_story_finder_row(
+    row_id: str,
+    request: StoryFinderRowRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Create or update a single Story Finder row (appended when new)"""
+    row = {"id": row_id, **request.model_dump()}
+    try:
+        result = await db_layer.story_finder_row_upsert(current_user.user_id, row, MAX_STORY_CARDS)
+    except db_layer.RowLimitExceeded:
+        raise HTTPException(status_code=409, detail=f"You can create up to {MAX_STORY_CARDS} story cards")
+    story_finder_row_edited(current_user.user_id, result)
+    return {"row": row, "position": result["row_position"]}
+
+@api_router.delete("/story-finder/rows/{row_id}")
+async def delete_story_finder_row(
+    row_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Delete a single Story Finder row"""
+    result = await db_layer.story_finder_row_delete(current_user.user_id, row_id)
+    if not result:
+        raise HTTPException(status_code=404, detail="Story Finder row not found")
+    story_finder_row_edited(current_user.user_id, result)
+    return {"message": "Story Finder row deleted successfully"}
+
+@api_router.post("/story-finder/rows/{row_id}/move")
+async def move_story_finder_row(
+    row_id: str,
+    request: MoveStoryFinderRowRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Move a single Story Finder row to a new position"""
+    result = await db_layer.story_finder_row_move(current_user.user_id, row_id, request.position)
+    if not result:
+        raise HTTPException(status_code=404, detail="Story Finder row not found")
+    story_finder_row_edited(current_user.user_id, result)
+    return {"id": row_id, "position": result["row_position"]}
+
 # ==================== CONTENT TIPS ROUTES ====================
 
 @api_router.post("/content-tips/quiz")
@@ -655,38 +1027,20 @@ async def complete_quiz(
 ):
     """Complete content tip quiz"""
     
-    # Check if already completed
-    existing = await db_layer.content_tips_find(current_user.user_id, request.tip_id)
+    # Progress row and coin award in one statement; coins only on first completion
+    coins_earned, updated_user = await db_layer.content_tips_complete_quiz(
+        current_user.user_id, request.tip_id, request.score, 10
+    )
     
-    if existing and existing.get("quiz_completed"):
+    if not coins_earned:
         return {
             "message": "Quiz already completed",
             "coins_earned": 0
         }
     
-    # Save progress
-    progress = ContentTipsProgress(
-        user_id=current_user.user_id,
-        tip_id=request.tip_id,
-        quiz_completed=True,
-        quiz_score=request.score,
-        completed_at=datetime.now(timezone.utc)
-    )
-    
-    if existing:
-        await db_layer.content_tips_update(current_user.user_id, request.tip_id, progress.model_dump())
-    else:
-        await db_layer.content_tips_insert(progress.model_dump())
-    
-    # Award coins
-    await db_layer.user_increment_coins(current_user.user_id, 10)
-    
-    # Get updated user
-    updated_user = await db_layer.user_find_by_id(current_user.user_id)
-    
     return {
         "message": "Quiz completed! You've earned 10 coins.",
-        "coins_earned": 10,
+        "coins_earned": coins_earned,
         "user": User(**updated_user)
     }
 
@@ -694,19 +1048,28 @@ async def complete_quiz(
 async def get_content_tips_progress(current_user: User = Depends(get_current_user)):
     """Get user's content tips progress"""
     
-    progress = await db_layer.content_tips_list(current_user.user_id)
-    
-    return {"progress": progress}
+    user_id = current_user.user_id
+    return await cached(user_id, "content_tips", lambda: load_content_tips_progress(user_id))
 
 # ==================== BATCHING ROUTES ====================
 
 @api_router.get("/batching/scripts")
-async def get_batching_scripts(current_user: User = Depends(get_current_user)):
-    """Get user's batching scripts"""
+async def get_batching_scripts(
+    fields: Optional[str] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Get user's batching scripts, newest first (?fields=title,date for a sparse fieldset)"""
+    
+    user_id = current_user.user_id
+    wanted = parse_fields(fields, Script)
     
-    scripts = await db_layer.batching_list(current_user.user_id)
+    async def load():
+        scripts, next_cursor = await db_layer.batching_page(user_id, limit, cursor, fields=wanted)
+        return {"scripts": scripts, "next_cursor": next_cursor}
     
-    return {"scripts": scripts}
+    return await cached(user_id, "batching", load, key=(fields, limit, cursor))
 
 @api_router.post("/batching/scripts")
 async def save_batching_script(
@@ -736,6 +1099,230 @@ async def delete_batching_script(
     
     return {"message": "Script deleted successfully"}
 
+# ==================== BOOTSTRAP ROUTES ====================
+
+async def load_story_finder(user_id: str) -> dict:
+    doc, _ = await load_document(user_id, "story_finder", lambda: load_story_finder_doc(user_id))
+    return {"rows": (doc or {}).get("rows") or []}
+
+async def load_bootstrap_document(user_id: str, kind: str, loader) -> Optional[dict]:
+    doc, _ = await load_document(user_id, kind, loader)
+    return doc
+
+async def load_batching_first_page(user_id: str) -> dict:
+    async def load():
+        scripts, next_cursor = await db_layer.batching_page(user_id, MAX_PAGE_SIZE)
+        return {"scripts": scripts, "next_cursor": next_cursor}
+    # Same entry as GET /batching/scripts with default parameters
+    return await cached(user_id, "batching", load, key=(None, MAX_PAGE_SIZE, None))
+
+async def load_content_tips_progress(user_id: str) -> dict:
+    return {"progress": await db_layer.content_tips_list(user_id)}
+
+@api_router.get("/bootstrap")
+async def bootstrap(current_user: User = Depends(get_current_user)):
+    """Everything the app loads on launch, in one authenticated request.
+    
+    Sections are read concurrently; a section that fails is null and its
+    error is listed under "errors" so the rest of the document still loads.
+    """
+    user_id = current_user.user_id
+    loaders = {
+        "mission_today": load_today_mission(user_id),
+        "creator_universe": load_bootstrap_document(
+            user_id, "creator_universe", lambda: load_creator_universe_cached(user_id)
+        ),
+        "schedule": load_bootstrap_document(user_id, "schedule", lambda: load_schedule_cached(user_id)),
+        "story_finder": load_story_finder(user_id),
+        "content_tips_progress": cached(user_id, "content_tips", lambda: load_content_tips_progress(user_id)),
+        "batching_scripts": load_batching_first_page(user_id),
+    }
+    results = await asyncio.gather(*loaders.values(), return_exceptions=True)
+    
+    document = {"user": current_user, "errors": {}}
+    for name, result in zip(loaders, results):
+        if isinstance(result, Exception):
+            logging.error(f"Bootstrap section {name} failed for {user_id}: {result}")
+            document[name] = None
+            document["errors"][name] = str(result) or type(result).__name__
+        else:
+            document[name] = result
+    
+    return document
+
+# ==================== SYNC ROUTES ====================
+
+@api_router.get("/sync")
+async def sync_changes(since: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    """Rows inserted, updated or deleted since the client's last sync token.
+    
+    Omit since for a full snapshot. Store next_token and send it next time;
+    when reset is true, replace the local copy instead of merging.
+    """
+    return await db_layer.sync_changes(current_user.user_id, since)
+
+# A retry racing the original request in this worker waits for it; the
+# idempotency keys themselves live in Postgres (sync_push_keys)
+sync_pushes = SingleFlight()
+
+SYNC_ENTITY_MODELS = {
+    "script": Script,
+    "analysis_entry": AnalysisEntry,
+    "story_finder_row": StoryFinderRow,
+    "schedule": UpdateScheduleRequest,
+}
+
+def validate_sync_mutation(index: int, m: SyncMutation) -> Optional[dict]:
+    """The mutation's data checked against its entity model (None for deletes)"""
+    if m.entity != "schedule" and not m.id:
+        raise HTTPException(status_code=422, detail=f"mutations[{index}]: id is required for {m.entity}")
+    if m.op == "delete":
+        return None
+    data = {**(m.data or {})}
+    if m.entity != "schedule":
+        data["id"] = m.id
+    try:
+        return SYNC_ENTITY_MODELS[m.entity].model_validate(data).model_dump()
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=f"mutations[{index}]: {e.errors(include_url=False)}")
+
+async def apply_sync_mutations(user_id: str, mutations: List[tuple]) -> Tuple[Set[str], Optional[BaseException]]:
+    """Apply (mutation, data) pairs in order as one grouped write per table.
+    
+    Returns the idempotency keys whose writes landed and the first failure;
+    a failed group does not stop the others.
+    """
+    # Last op per row wins for the keyed tables; every folded mutation lands with it
+    latest: Dict[str, Dict[str, Optional[dict]]] = {"script": {}, "analysis_entry": {}}
+    row_keys: Dict[tuple, List[str]] = {}
+    story_ops = []
+    schedule_op = None
+    schedule_keys = []
+    for m, data in mutations:
+        if m.entity in latest:
+            latest[m.entity].pop(m.id, None)
+            latest[m.entity][m.id] = data
+            row_keys.setdefault((m.entity, m.id), []).append(m.idempotency_key)
+        elif m.entity == "story_finder_row":
+            story_ops.append((m.id, data, m.idempotency_key))
+        else:
+            schedule_op = (m.op, data)
+            schedule_keys.append(m.idempotency_key)
+    
+    groups = []  # (write, keys it applies)
+    for entity, upsert_many, delete_many in (
+        ("script", db_layer.batching_upsert_many, db_layer.batching_delete_many),
+        ("analysis_entry", db_layer.analysis_upsert_many, db_layer.analysis_delete_many),
+    ):
+        rows = latest[entity]
+        upserts = [i for i, d in rows.items() if d is not None]
+        deletes = [i for i, d in rows.items() if d is None]
+        # Unbuffered: a key is only marked applied once its row is in the database
+        groups.append((
+            upsert_many(user_id, [(i, rows[i]) for i in upserts], buffered=False),
+            [k for i in upserts for k in row_keys[(entity, i)]],
+        ))
+        groups.append((delete_many(user_id, deletes), [k for i in deletes for k in row_keys[(entity, i)]]))
+    # Story ops run one by one, so each reports its own key as it lands
+    story_landed: List[str] = []
+    if story_ops:
+        groups.append((apply_story_finder_ops(user_id, story_ops, story_landed), []))
+    if schedule_op is not None:
+        groups.append((apply_schedule_op(user_id, *schedule_op), schedule_keys))
+    
+    outcomes = await asyncio.gather(*(write for write, _ in groups), return_exceptions=True)
+    landed = set(story_landed)
+    error = None
+    for (_, keys), outcome in zip(groups, outcomes):
+        if isinstance(outcome, BaseException):
+            error = error or outcome
+        else:
+            landed.update(keys)
+    return landed, error
+
+async def apply_story_finder_ops(user_id: str, ops: List[tuple], landed: List[str]):
+    """Apply row upserts/deletes in order, each as one row-addressed edit"""
+    result = None
+    try:
+        for row_id, data, key in ops:
+            if data is None:
+                result = await db_layer.story_finder_row_delete(user_id, row_id) or result
+            else:
+                try:
+                    result = await db_layer.story_finder_row_upsert(user_id, data, MAX_STORY_CARDS)
+                except db_layer.RowLimitExceeded:
+                    raise HTTPException(status_code=409, detail=f"You can create up to {MAX_STORY_CARDS} story cards")
+            landed.append(key)
+    finally:
+        if result:
+            story_finder_row_edited(user_id, result)
+
+async def apply_schedule_op(user_id: str, op: str, data: Optional[dict]):
+    if op == "delete":
+        await db_layer.schedule_delete_by_user(user_id)
+        return
+    schedule = await db_layer.schedule_upsert({
+        "user_id": user_id,
+        "schedule": data["schedule"],
+        "updated_at": datetime.now(timezone.utc)
+    })
+    remember_etag(user_id, "schedule", schedule)
+
+async def release_sync_push_keys(user_id: str, keys: Set[str]):
+    try:
+        await db_layer.sync_push_keys_release(user_id, list(keys))
+    except Exception as e:
+        logging.error(f"Failed to release sync push keys for {user_id}: {e}")
+
+async def push_sync_mutations(user_id: str, mutations: List[SyncMutation]) -> dict:
+    validated = [(m, validate_sync_mutation(i, m)) for i, m in enumerate(mutations)]
+    
+    # Claim keys before writing: a retry on any worker or instance skips the
+    # applied ones and waits out the ones another request is still applying
+    statuses = await db_layer.sync_push_keys_claim(user_id, list(dict.fromkeys(m.idempotency_key for m in mutations)))
+    claimed = {key for key, status in statuses.items() if status == "claimed"}
+    if any(status == "pending" for status in statuses.values()):
+        await release_sync_push_keys(user_id, claimed)
+        raise HTTPException(status_code=409, detail="Some mutations are still being applied; retry shortly")
+    
+    results = []
+    pending = []
+    seen = set()
+    for m, data in validated:
+        key = m.idempotency_key
+        if key in seen or key not in claimed:
+            results.append({"idempotency_key": key, "status": "duplicate"})
+            continue
+        seen.add(key)
+        pending.append((m, data))
+        results.append({"idempotency_key": key, "status": "applied"})
+    
+    if pending:
+        landed, error = await apply_sync_mutations(user_id, pending)
+        try:
+            await db_layer.sync_push_keys_applied(user_id, list(landed))
+        except Exception as e:
+            # The keys stay pending until their lease lapses, then a retry re-applies them
+            logging.error(f"Failed to mark sync push keys applied for {user_id}: {e}")
+        if error is not None:
+            await release_sync_push_keys(user_id, claimed - landed)
+            raise error
+    
+    return {"results": results, "applied": len(pending), "duplicates": len(results) - len(pending)}
+
+@api_router.post("/sync/push")
+async def sync_push(request: SyncPushRequest, current_user: User = Depends(get_current_user)):
+    """Apply an ordered batch of offline/autosave mutations.
+    
+    Each mutation's idempotency_key is claimed in the database before its
+    write, marked applied once the write lands and released if it fails, so
+    retrying a batch only applies the mutations that did not land the first
+    time. A retry that overlaps a push still applying the same keys gets 409.
+    """
+    user_id = current_user.user_id
+    flight_key = (user_id, tuple(m.idempotency_key for m in request.mutations))
+    return await sync_pushes.do(flight_key, lambda: push_sync_mutations(user_id, request.mutations))
+
 # ==================== HEALTH CHECK ====================
 
 @app.get("/")
@@ -754,6 +1341,22 @@ async def health_check():
     except Exception as e:
         return {"status": "unhealthy", "database": "disconnected", "error": str(e)}
 
+@app.get("/metrics")
+async def metrics():
+    """In-process cache counters for sizing"""
+    return {
+        "auth_cache": db_layer.auth_cache.stats(),
+        "jwks": supabase_jwks.stats(),
+        "session_exchanges": session_exchanges.stats(),
+        "db_executor": db_layer.executor_stats(),
+        "db_coalesced": db_layer.coalesce_stats(),
+        "doc_etags": doc_etags.stats(),
+        "response_cache": response_cache.stats(),
+        "invalidation_bus": invalidation.bus.stats(),
+        "write_buffer": db_layer.write_buffer.stats() if db_layer.write_buffer else None,
+        "sync_pushes": sync_pushes.stats(),
+    }
+
 # ==================== INCLUDE ROUTER ====================
 
 app.include_router(api_router)
@@ -3,4 +3,10 @@
 # Fixes TLSV1_ALERT_INTERNAL_ERROR with Ubuntu 24.04
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 export OPENSSL_CONF="$SCRIPT_DIR/openssl-seclevel1.cnf"
-exec uvicorn server:app --host 0.0.0.0 --port "${PORT:-8000}"
+cd "$SCRIPT_DIR"
+# A single uvicorn process by default; WEB_CONCURRENCY > 1 runs prefork
+# workers (see gunicorn.conf.py, which requires DATABASE_URL for that)
+if [ "${WEB_CONCURRENCY:-1}" = "1" ]; then
+    exec uvicorn server:app --host 0.0.0.0 --port "${PORT:-8000}" --timeout-graceful-shutdown "${GRACEFUL_TIMEOUT:-30}"
+fi
+exec gunicorn server:app -c gunicorn.conf.py
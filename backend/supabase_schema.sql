@@ -136,3 +136,760 @@ ALTER TABLE batching_scripts ENABLE ROW LEVEL SECURITY;
 
 -- Allow service role full access (service role bypasses RLS by default)
 -- Allow all for now - backend uses service_role key which bypasses RLS
+
+-- Session + user lookup in one round trip for get_current_user.
+-- Returns nothing for unknown or expired tokens (expiry is checked here, not in Python).
+CREATE OR REPLACE FUNCTION session_user_by_token(p_token TEXT)
+RETURNS TABLE (session_doc JSONB, user_doc JSONB)
+LANGUAGE sql STABLE
+AS $$
+    SELECT to_jsonb(s) - 'id', to_jsonb(u)
+    FROM user_sessions s
+    JOIN users u ON u.user_id = s.user_id
+    WHERE s.session_token = p_token
+      AND s.expires_at > NOW();
+$$;
+
+-- Atomic coin award (no read-modify-write); returns the updated user row.
+CREATE OR REPLACE FUNCTION increment_coins(p_user_id TEXT, p_delta INTEGER)
+RETURNS SETOF users
+LANGUAGE sql
+AS $$
+    UPDATE users
+    SET coins = COALESCE(coins, 0) + p_delta
+    WHERE user_id = p_user_id
+    RETURNING *;
+$$;
+
+-- Deleted user_ids, so a still-valid Supabase access token cannot recreate
+-- the account it belonged to (see create_user_from_claims in server.py)
+CREATE TABLE IF NOT EXISTS deleted_accounts (
+    user_id TEXT PRIMARY KEY,
+    deleted_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+ALTER TABLE deleted_accounts ENABLE ROW LEVEL SECURITY;
+
+-- Delete a user and everything they own in one transaction.
+-- Every child table also has ON DELETE CASCADE to users(user_id); the explicit
+-- deletes keep this correct even if a cascade is dropped later.
+CREATE OR REPLACE FUNCTION delete_user_account(p_user_id TEXT)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    DELETE FROM user_sessions WHERE user_id = p_user_id;
+    DELETE FROM creator_universe WHERE user_id = p_user_id;
+    DELETE FROM analysis_entries WHERE user_id = p_user_id;
+    DELETE FROM schedule WHERE user_id = p_user_id;
+    DELETE FROM story_finder WHERE user_id = p_user_id;
+    DELETE FROM content_tips_progress WHERE user_id = p_user_id;
+    DELETE FROM batching_scripts WHERE user_id = p_user_id;
+    DELETE FROM missions WHERE user_id = p_user_id;
+    DELETE FROM sos_completions WHERE user_id = p_user_id;
+    DELETE FROM users WHERE user_id = p_user_id;
+    INSERT INTO deleted_accounts (user_id) VALUES (p_user_id)
+    ON CONFLICT (user_id) DO UPDATE SET deleted_at = NOW();
+END;
+$$;
+
+-- Keyset pagination (newest first) for the list endpoints
+CREATE INDEX IF NOT EXISTS idx_analysis_user_page ON analysis_entries(user_id, id DESC);
+CREATE INDEX IF NOT EXISTS idx_batching_user_page ON batching_scripts(user_id, id DESC);
+CREATE INDEX IF NOT EXISTS idx_sos_user_page ON sos_completions(user_id, completed_at DESC, id DESC);
+
+-- Row versions for conditional GETs: the API's ETag is derived from updated_at + version
+ALTER TABLE creator_universe ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 1;
+ALTER TABLE schedule ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 1;
+ALTER TABLE story_finder ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 1;
+
+CREATE OR REPLACE FUNCTION bump_row_version()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.version := OLD.version + 1;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS creator_universe_version ON creator_universe;
+CREATE TRIGGER creator_universe_version BEFORE UPDATE ON creator_universe
+    FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+DROP TRIGGER IF EXISTS schedule_version ON schedule;
+CREATE TRIGGER schedule_version BEFORE UPDATE ON schedule
+    FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+DROP TRIGGER IF EXISTS story_finder_version ON story_finder;
+CREATE TRIGGER story_finder_version BEFORE UPDATE ON story_finder
+    FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+
+-- ==================== INCREMENTAL SYNC ====================
+-- Every per-user table carries a database-clock updated_at (set by trigger, so
+-- app server clocks never matter), and deletes leave tombstones.
+ALTER TABLE analysis_entries ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+ALTER TABLE batching_scripts ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+ALTER TABLE content_tips_progress ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+
+CREATE OR REPLACE FUNCTION touch_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.updated_at := NOW();
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS analysis_entries_touch ON analysis_entries;
+CREATE TRIGGER analysis_entries_touch BEFORE INSERT OR UPDATE ON analysis_entries
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+DROP TRIGGER IF EXISTS batching_scripts_touch ON batching_scripts;
+CREATE TRIGGER batching_scripts_touch BEFORE INSERT OR UPDATE ON batching_scripts
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+DROP TRIGGER IF EXISTS content_tips_progress_touch ON content_tips_progress;
+CREATE TRIGGER content_tips_progress_touch BEFORE INSERT OR UPDATE ON content_tips_progress
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+DROP TRIGGER IF EXISTS creator_universe_touch ON creator_universe;
+CREATE TRIGGER creator_universe_touch BEFORE INSERT OR UPDATE ON creator_universe
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+DROP TRIGGER IF EXISTS schedule_touch ON schedule;
+CREATE TRIGGER schedule_touch BEFORE INSERT OR UPDATE ON schedule
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+DROP TRIGGER IF EXISTS story_finder_touch ON story_finder;
+CREATE TRIGGER story_finder_touch BEFORE INSERT OR UPDATE ON story_finder
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+CREATE TABLE IF NOT EXISTS sync_tombstones (
+    id BIGSERIAL PRIMARY KEY,
+    user_id TEXT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    table_name TEXT NOT NULL,
+    row_key TEXT NOT NULL,
+    deleted_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- TG_ARGV[0] names the row's client-facing key column
+CREATE OR REPLACE FUNCTION record_tombstone()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO sync_tombstones (user_id, table_name, row_key)
+    SELECT OLD.user_id, TG_TABLE_NAME, to_jsonb(OLD) ->> TG_ARGV[0]
+    WHERE EXISTS (SELECT 1 FROM users WHERE user_id = OLD.user_id);
+    RETURN OLD;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS analysis_entries_tombstone ON analysis_entries;
+CREATE TRIGGER analysis_entries_tombstone AFTER DELETE ON analysis_entries
+    FOR EACH ROW EXECUTE FUNCTION record_tombstone('entry_id');
+DROP TRIGGER IF EXISTS batching_scripts_tombstone ON batching_scripts;
+CREATE TRIGGER batching_scripts_tombstone AFTER DELETE ON batching_scripts
+    FOR EACH ROW EXECUTE FUNCTION record_tombstone('script_id');
+DROP TRIGGER IF EXISTS content_tips_progress_tombstone ON content_tips_progress;
+CREATE TRIGGER content_tips_progress_tombstone AFTER DELETE ON content_tips_progress
+    FOR EACH ROW EXECUTE FUNCTION record_tombstone('tip_id');
+-- One-row-per-user documents are keyed by the user_id itself
+DROP TRIGGER IF EXISTS creator_universe_tombstone ON creator_universe;
+CREATE TRIGGER creator_universe_tombstone AFTER DELETE ON creator_universe
+    FOR EACH ROW EXECUTE FUNCTION record_tombstone('user_id');
+DROP TRIGGER IF EXISTS schedule_tombstone ON schedule;
+CREATE TRIGGER schedule_tombstone AFTER DELETE ON schedule
+    FOR EACH ROW EXECUTE FUNCTION record_tombstone('user_id');
+DROP TRIGGER IF EXISTS story_finder_tombstone ON story_finder;
+CREATE TRIGGER story_finder_tombstone AFTER DELETE ON story_finder
+    FOR EACH ROW EXECUTE FUNCTION record_tombstone('user_id');
+
+-- Database clock read at the start of a sync; the next sync token is based on it
+CREATE OR REPLACE FUNCTION sync_clock()
+RETURNS TIMESTAMPTZ
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT NOW();
+$$;
+
+-- Clients whose token is older than the retention window get a full resync;
+-- schedule this (e.g. pg_cron daily) to keep the table small.
+CREATE OR REPLACE FUNCTION prune_sync_tombstones(p_retention INTERVAL DEFAULT INTERVAL '30 days')
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    DELETE FROM sync_tombstones WHERE deleted_at < NOW() - p_retention;
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_analysis_user_updated ON analysis_entries(user_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_batching_user_updated ON batching_scripts(user_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_content_tips_user_updated ON content_tips_progress(user_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_creator_universe_user_updated ON creator_universe(user_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_schedule_user_updated ON schedule(user_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_story_finder_user_updated ON story_finder(user_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_sync_tombstones_user_deleted ON sync_tombstones(user_id, deleted_at);
+
+ALTER TABLE sync_tombstones ENABLE ROW LEVEL SECURITY;
+
+-- Idempotency keys of /api/sync/push mutations, shared by every worker and
+-- instance. A key is claimed (pending) before its write, marked applied once
+-- the write lands and released if it fails, so a retried batch only applies
+-- what did not land. A pending key older than the lease was orphaned by a
+-- crashed request and can be claimed again.
+CREATE TABLE IF NOT EXISTS sync_push_keys (
+    user_id TEXT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    idempotency_key TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    applied BOOLEAN NOT NULL DEFAULT FALSE,
+    PRIMARY KEY (user_id, idempotency_key)
+);
+
+ALTER TABLE sync_push_keys ADD COLUMN IF NOT EXISTS applied BOOLEAN NOT NULL DEFAULT FALSE;
+
+CREATE INDEX IF NOT EXISTS idx_sync_push_keys_created ON sync_push_keys(created_at);
+
+ALTER TABLE sync_push_keys ENABLE ROW LEVEL SECURITY;
+
+-- Status per key: 'claimed' by this call, already 'applied', or 'pending'
+-- under another request's live lease
+DROP FUNCTION IF EXISTS claim_sync_push_keys(TEXT, TEXT[]);
+CREATE OR REPLACE FUNCTION claim_sync_push_keys(
+    p_user_id TEXT,
+    p_keys TEXT[],
+    p_lease INTERVAL DEFAULT INTERVAL '2 minutes'
+)
+RETURNS TABLE(idempotency_key TEXT, status TEXT)
+LANGUAGE sql
+AS $$
+    WITH requested AS (
+        SELECT DISTINCT k FROM unnest(p_keys) AS k
+    ), claimed AS (
+        INSERT INTO sync_push_keys AS s (user_id, idempotency_key)
+        SELECT p_user_id, k FROM requested
+        ON CONFLICT (user_id, idempotency_key) DO UPDATE SET created_at = NOW()
+            WHERE NOT s.applied AND s.created_at < NOW() - p_lease
+        RETURNING s.idempotency_key
+    )
+    -- The outer query sees the table as of before the insert: new claims
+    -- come from the CTE, existing keys from the table
+    SELECT r.k,
+           CASE
+               WHEN c.idempotency_key IS NOT NULL THEN 'claimed'
+               WHEN s.applied THEN 'applied'
+               ELSE 'pending'
+           END
+    FROM requested r
+    LEFT JOIN claimed c ON c.idempotency_key = r.k
+    LEFT JOIN sync_push_keys s ON s.user_id = p_user_id AND s.idempotency_key = r.k;
+$$;
+
+-- Schedule this (e.g. pg_cron daily) alongside prune_sync_tombstones()
+CREATE OR REPLACE FUNCTION prune_sync_push_keys(p_retention INTERVAL DEFAULT INTERVAL '30 days')
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    DELETE FROM sync_push_keys WHERE created_at < NOW() - p_retention;
+$$;
+
+-- ==================== PARTIAL DOCUMENT UPDATES ====================
+-- RFC 7386 JSON merge patch: objects merge recursively, null removes a key,
+-- anything else replaces the target.
+CREATE OR REPLACE FUNCTION jsonb_merge_patch(target JSONB, patch JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql IMMUTABLE
+AS $$
+DECLARE
+    k TEXT;
+    v JSONB;
+    result JSONB;
+BEGIN
+    IF patch IS NULL OR jsonb_typeof(patch) <> 'object' THEN
+        RETURN patch;
+    END IF;
+    result := CASE WHEN jsonb_typeof(target) = 'object' THEN target ELSE '{}'::jsonb END;
+    FOR k, v IN SELECT * FROM jsonb_each(patch) LOOP
+        IF jsonb_typeof(v) = 'null' THEN
+            result := result - k;
+        ELSE
+            result := jsonb_set(result, ARRAY[k], jsonb_merge_patch(result -> k, v), true);
+        END IF;
+    END LOOP;
+    RETURN result;
+END;
+$$;
+
+-- RFC 6901 JSON pointer ("/content_pillars/0/ideas/-") as a text[] path
+CREATE OR REPLACE FUNCTION jsonb_pointer_path(p_pointer TEXT)
+RETURNS TEXT[]
+LANGUAGE plpgsql IMMUTABLE
+AS $$
+BEGIN
+    IF p_pointer IS NULL OR left(p_pointer, 1) <> '/' THEN
+        RAISE EXCEPTION 'Invalid JSON pointer: %', p_pointer USING ERRCODE = '22023';
+    END IF;
+    RETURN ARRAY(
+        SELECT replace(replace(part, '~1', '/'), '~0', '~')
+        FROM unnest(string_to_array(substr(p_pointer, 2), '/')) WITH ORDINALITY AS t(part, n)
+        ORDER BY n
+    );
+END;
+$$;
+
+-- Value at a parsed pointer, or NULL if absent. Array steps must be RFC 6901
+-- indexes: no "-", negatives or leading zeros (which #> would accept).
+CREATE OR REPLACE FUNCTION jsonb_patch_get(target JSONB, path TEXT[])
+RETURNS JSONB
+LANGUAGE plpgsql IMMUTABLE
+AS $$
+DECLARE
+    node JSONB := target;
+    part TEXT;
+BEGIN
+    FOREACH part IN ARRAY path LOOP
+        CASE jsonb_typeof(node)
+            WHEN 'object' THEN
+                node := node -> part;
+            WHEN 'array' THEN
+                IF part !~ '^(0|[1-9][0-9]{0,8})$' THEN
+                    RETURN NULL;
+                END IF;
+                node := node -> part::INTEGER;
+            ELSE
+                RETURN NULL;
+        END CASE;
+        IF node IS NULL THEN
+            RETURN NULL;
+        END IF;
+    END LOOP;
+    RETURN node;
+END;
+$$;
+
+-- RFC 6902 "add": sets an object member, or inserts into an array at an
+-- index from 0 to its length ("-" appends)
+CREATE OR REPLACE FUNCTION jsonb_patch_add(target JSONB, path TEXT[], value JSONB, p_pointer TEXT)
+RETURNS JSONB
+LANGUAGE plpgsql IMMUTABLE
+AS $$
+DECLARE
+    depth INTEGER := cardinality(path);
+    parent JSONB := jsonb_patch_get(target, path[1:depth - 1]);
+BEGIN
+    IF jsonb_typeof(parent) = 'object' THEN
+        RETURN jsonb_set(target, path, value, true);
+    ELSIF jsonb_typeof(parent) IS DISTINCT FROM 'array' THEN
+        RAISE EXCEPTION 'Path not found: %', p_pointer USING ERRCODE = '22023';
+    END IF;
+    IF path[depth] = '-' THEN
+        path[depth] := jsonb_array_length(parent)::TEXT;
+    ELSIF path[depth] !~ '^(0|[1-9][0-9]{0,8})$' THEN
+        RAISE EXCEPTION 'Invalid array index: %', p_pointer USING ERRCODE = '22023';
+    ELSIF path[depth]::INTEGER > jsonb_array_length(parent) THEN
+        RAISE EXCEPTION 'Array index out of range: %', p_pointer USING ERRCODE = '22023';
+    END IF;
+    RETURN jsonb_insert(target, path, value);
+END;
+$$;
+
+-- RFC 6902 JSON Patch (add, remove, replace, move, copy, test) applied in order
+CREATE OR REPLACE FUNCTION jsonb_apply_patch(target JSONB, ops JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql IMMUTABLE
+AS $$
+DECLARE
+    op JSONB;
+    path TEXT[];
+    from_path TEXT[];
+    value JSONB;
+BEGIN
+    IF jsonb_typeof(ops) <> 'array' THEN
+        RAISE EXCEPTION 'JSON Patch must be an array of operations' USING ERRCODE = '22023';
+    END IF;
+    FOR op IN SELECT * FROM jsonb_array_elements(ops) LOOP
+        path := jsonb_pointer_path(op ->> 'path');
+        IF cardinality(path) = 0 THEN
+            RAISE EXCEPTION 'JSON Patch cannot target the whole document' USING ERRCODE = '22023';
+        END IF;
+        IF op ->> 'op' IN ('add', 'replace', 'test') AND NOT op ? 'value' THEN
+            RAISE EXCEPTION '% at % needs a value', op ->> 'op', op ->> 'path' USING ERRCODE = '22023';
+        END IF;
+        IF op ->> 'op' IN ('move', 'copy') THEN
+            from_path := jsonb_pointer_path(op ->> 'from');
+            value := jsonb_patch_get(target, from_path);
+            IF value IS NULL OR cardinality(from_path) = 0 THEN
+                RAISE EXCEPTION 'Path not found: %', op ->> 'from' USING ERRCODE = '22023';
+            END IF;
+        END IF;
+        CASE op ->> 'op'
+            WHEN 'add' THEN
+                target := jsonb_patch_add(target, path, op -> 'value', op ->> 'path');
+            WHEN 'replace' THEN
+                IF jsonb_patch_get(target, path) IS NULL THEN
+                    RAISE EXCEPTION 'Path not found: %', op ->> 'path' USING ERRCODE = '22023';
+                END IF;
+                target := jsonb_set(target, path, op -> 'value', false);
+            WHEN 'remove' THEN
+                IF jsonb_patch_get(target, path) IS NULL THEN
+                    RAISE EXCEPTION 'Path not found: %', op ->> 'path' USING ERRCODE = '22023';
+                END IF;
+                target := target #- path;
+            WHEN 'move' THEN
+                IF cardinality(path) > cardinality(from_path)
+                   AND path[1:cardinality(from_path)] = from_path THEN
+                    RAISE EXCEPTION 'Cannot move % into itself', op ->> 'from' USING ERRCODE = '22023';
+                END IF;
+                target := jsonb_patch_add(target #- from_path, path, value, op ->> 'path');
+            WHEN 'copy' THEN
+                target := jsonb_patch_add(target, path, value, op ->> 'path');
+            WHEN 'test' THEN
+                IF jsonb_patch_get(target, path) IS DISTINCT FROM op -> 'value' THEN
+                    RAISE EXCEPTION 'Test failed at %', op ->> 'path' USING ERRCODE = '22023';
+                END IF;
+            ELSE
+                RAISE EXCEPTION 'Unsupported JSON Patch op: %', op ->> 'op' USING ERRCODE = '22023';
+        END CASE;
+    END LOOP;
+    RETURN target;
+END;
+$$;
+
+-- Apply a merge patch and/or JSON Patch ops to a user's creator universe in
+-- place (row locked for the read-modify-write); returns the updated row.
+CREATE OR REPLACE FUNCTION creator_universe_patch(p_user_id TEXT, p_merge JSONB DEFAULT NULL, p_ops JSONB DEFAULT NULL)
+RETURNS SETOF creator_universe
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    doc JSONB;
+BEGIN
+    SELECT jsonb_build_object(
+        'overarching_goal', overarching_goal,
+        'content_pillars', content_pillars,
+        'avatar', avatar,
+        'identity', identity
+    )
+    INTO doc
+    FROM creator_universe
+    WHERE user_id = p_user_id
+    FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    IF p_merge IS NOT NULL THEN
+        doc := jsonb_merge_patch(doc, p_merge);
+    END IF;
+    IF p_ops IS NOT NULL THEN
+        doc := jsonb_apply_patch(doc, p_ops);
+    END IF;
+
+    IF jsonb_typeof(doc -> 'overarching_goal') NOT IN ('string', 'null')
+       OR jsonb_typeof(doc -> 'content_pillars') NOT IN ('array', 'null')
+       OR jsonb_typeof(doc -> 'avatar') NOT IN ('object', 'null')
+       OR jsonb_typeof(doc -> 'identity') NOT IN ('object', 'null') THEN
+        RAISE EXCEPTION 'Patched creator universe has invalid field types' USING ERRCODE = '22023';
+    END IF;
+
+    RETURN QUERY
+    UPDATE creator_universe
+    SET overarching_goal = COALESCE(doc ->> 'overarching_goal', ''),
+        content_pillars = COALESCE(NULLIF(doc -> 'content_pillars', 'null'::jsonb), '[]'::jsonb),
+        avatar = NULLIF(doc -> 'avatar', 'null'::jsonb),
+        identity = NULLIF(doc -> 'identity', 'null'::jsonb)
+    WHERE user_id = p_user_id
+    RETURNING *;
+END;
+$$;
+
+-- ==================== STORY FINDER ROW EDITS ====================
+-- Row-addressed edits of story_finder.rows (elements matched by their "id").
+-- Each call locks the user's row and changes one element, so edits to
+-- different cards from two devices serialize instead of overwriting each other.
+-- They return the document's new updated_at/version (for the ETag) and the
+-- edited row's position, not the whole rows array.
+
+-- 0-based position of the element with p_row_id, or NULL
+CREATE OR REPLACE FUNCTION story_finder_row_index(p_rows JSONB, p_row_id TEXT)
+RETURNS INTEGER
+LANGUAGE sql IMMUTABLE
+AS $$
+    SELECT (ord - 1)::INTEGER
+    FROM jsonb_array_elements(COALESCE(p_rows, '[]'::jsonb)) WITH ORDINALITY AS e(elem, ord)
+    WHERE elem ->> 'id' = p_row_id
+    LIMIT 1;
+$$;
+
+-- Replace the row with p_row's id in place, or append it (up to p_max_rows)
+CREATE OR REPLACE FUNCTION story_finder_row_upsert(p_user_id TEXT, p_row JSONB, p_max_rows INTEGER DEFAULT 100)
+RETURNS TABLE (updated_at TIMESTAMPTZ, version BIGINT, row_position INTEGER)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+DECLARE
+    current_rows JSONB;
+    idx INTEGER;
+BEGIN
+    INSERT INTO story_finder (user_id, rows) VALUES (p_user_id, '[]'::jsonb)
+    ON CONFLICT (user_id) DO NOTHING;
+    SELECT COALESCE(rows, '[]'::jsonb) INTO current_rows FROM story_finder WHERE user_id = p_user_id FOR UPDATE;
+
+    idx := story_finder_row_index(current_rows, p_row ->> 'id');
+    IF idx IS NOT NULL THEN
+        current_rows := jsonb_set(current_rows, ARRAY[idx::TEXT], p_row);
+    ELSIF jsonb_array_length(current_rows) >= p_max_rows THEN
+        RAISE EXCEPTION 'Story card limit (%) reached', p_max_rows USING ERRCODE = '22023';
+    ELSE
+        idx := jsonb_array_length(current_rows);
+        current_rows := current_rows || jsonb_build_array(p_row);
+    END IF;
+
+    RETURN QUERY
+    UPDATE story_finder SET rows = current_rows WHERE user_id = p_user_id
+    RETURNING updated_at, version, idx;
+END;
+$$;
+
+-- Remove one row; returns nothing when it did not exist
+CREATE OR REPLACE FUNCTION story_finder_row_delete(p_user_id TEXT, p_row_id TEXT)
+RETURNS TABLE (updated_at TIMESTAMPTZ, version BIGINT, row_position INTEGER)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+DECLARE
+    current_rows JSONB;
+    idx INTEGER;
+BEGIN
+    SELECT rows INTO current_rows FROM story_finder WHERE user_id = p_user_id FOR UPDATE;
+    idx := story_finder_row_index(current_rows, p_row_id);
+    IF idx IS NULL THEN
+        RETURN;
+    END IF;
+    RETURN QUERY
+    UPDATE story_finder SET rows = current_rows - idx WHERE user_id = p_user_id
+    RETURNING updated_at, version, idx;
+END;
+$$;
+
+-- Move one row to p_position (clamped to the ends); returns nothing when it did not exist
+CREATE OR REPLACE FUNCTION story_finder_row_move(p_user_id TEXT, p_row_id TEXT, p_position INTEGER)
+RETURNS TABLE (updated_at TIMESTAMPTZ, version BIGINT, row_position INTEGER)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+DECLARE
+    current_rows JSONB;
+    idx INTEGER;
+    moved JSONB;
+BEGIN
+    SELECT rows INTO current_rows FROM story_finder WHERE user_id = p_user_id FOR UPDATE;
+    idx := story_finder_row_index(current_rows, p_row_id);
+    IF idx IS NULL THEN
+        RETURN;
+    END IF;
+    moved := current_rows -> idx;
+    current_rows := current_rows - idx;
+    idx := LEAST(GREATEST(p_position, 0), jsonb_array_length(current_rows));
+    current_rows := jsonb_insert(current_rows, ARRAY[idx::TEXT], moved);
+    RETURN QUERY
+    UPDATE story_finder SET rows = current_rows WHERE user_id = p_user_id
+    RETURNING updated_at, version, idx;
+END;
+$$;
+
+-- ==================== MISSION COMPLETION ====================
+-- Complete the (user, date) mission and award progress in one transaction.
+-- Idempotent per (user_id, date): the upsert only changes a row that is not
+-- completed yet, so a double tap awards once and reports already_completed.
+-- Streak follows last_post_date: next day +1, a gap resets to 1, same or
+-- earlier day leaves it, first ever post starts at 1.
+CREATE OR REPLACE FUNCTION complete_mission(p_user_id TEXT, p_date TEXT, p_coins INTEGER DEFAULT 10)
+RETURNS TABLE (already_completed BOOLEAN, user_doc JSONB)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    mission_date DATE := p_date::DATE;
+    completed_now BOOLEAN;
+    last_post TEXT;
+    days_diff INTEGER;
+    updated users;
+BEGIN
+    INSERT INTO missions (user_id, date, completed)
+    VALUES (p_user_id, p_date, TRUE)
+    ON CONFLICT (user_id, date) DO UPDATE SET completed = TRUE
+    WHERE missions.completed IS NOT TRUE
+    RETURNING TRUE INTO completed_now;
+
+    IF completed_now IS NULL THEN
+        RETURN QUERY SELECT TRUE, to_jsonb(u) FROM users u WHERE u.user_id = p_user_id;
+        RETURN;
+    END IF;
+
+    SELECT u.last_post_date INTO last_post FROM users u WHERE u.user_id = p_user_id FOR UPDATE;
+    IF NULLIF(last_post, '') IS NOT NULL THEN
+        days_diff := mission_date - last_post::DATE;
+    END IF;
+
+    UPDATE users u
+    SET streak = CASE
+            WHEN days_diff IS NULL THEN 1
+            WHEN days_diff = 1 THEN COALESCE(u.streak, 0) + 1
+            WHEN days_diff > 1 THEN 1
+            ELSE u.streak
+        END,
+        coins = COALESCE(u.coins, 0) + p_coins,
+        current_planet = COALESCE(u.current_planet, 0) + 1,
+        last_post_date = p_date
+    WHERE u.user_id = p_user_id
+    RETURNING u.* INTO updated;
+
+    RETURN QUERY SELECT FALSE, to_jsonb(updated);
+END;
+$$;
+
+-- ==================== QUIZ COMPLETION ====================
+-- Record a passed quiz and award coins in one statement. Coins are only
+-- added when this call is what marked the tip completed (a new row, or an
+-- existing row that was not completed yet), so retries and races award once.
+CREATE OR REPLACE FUNCTION complete_quiz(p_user_id TEXT, p_tip_id TEXT, p_score INTEGER, p_coins INTEGER DEFAULT 10)
+RETURNS TABLE (coins_earned INTEGER, user_doc JSONB)
+LANGUAGE sql
+AS $$
+    WITH progress AS (
+        INSERT INTO content_tips_progress (user_id, tip_id, quiz_completed, quiz_score, completed_at)
+        VALUES (p_user_id, p_tip_id, TRUE, p_score, NOW())
+        ON CONFLICT (user_id, tip_id) DO UPDATE
+        SET quiz_completed = TRUE, quiz_score = EXCLUDED.quiz_score, completed_at = EXCLUDED.completed_at
+        WHERE content_tips_progress.quiz_completed IS NOT TRUE
+        RETURNING user_id
+    ),
+    awarded AS (
+        UPDATE users u
+        SET coins = COALESCE(u.coins, 0) + p_coins
+        FROM progress
+        WHERE u.user_id = progress.user_id
+        RETURNING u.*
+    )
+    SELECT p_coins, to_jsonb(awarded) FROM awarded
+    UNION ALL
+    SELECT 0, to_jsonb(u) FROM users u
+    WHERE u.user_id = p_user_id AND NOT EXISTS (SELECT 1 FROM awarded);
+$$;
+
+-- ==================== LOGIN ====================
+-- Find-or-create the user by email, make sure they have a creator universe,
+-- and rotate their sessions, in one transaction.
+-- p_user_id is only used when the email is new. p_max_sessions caps
+-- concurrent device sessions (newest kept); NULL or 0 keeps only this one.
+CREATE OR REPLACE FUNCTION login_user(
+    p_user_id TEXT,
+    p_email TEXT,
+    p_name TEXT,
+    p_picture TEXT,
+    p_session_token TEXT,
+    p_expires_at TIMESTAMPTZ,
+    p_content_pillars JSONB,
+    p_max_sessions INTEGER DEFAULT NULL
+)
+RETURNS TABLE (user_doc JSONB, created BOOLEAN)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    account users;
+    is_new BOOLEAN := FALSE;
+BEGIN
+    INSERT INTO users (user_id, email, name, picture, streak, coins, current_planet)
+    VALUES (p_user_id, p_email, p_name, p_picture, 0, 0, 0)
+    ON CONFLICT (email) DO NOTHING
+    RETURNING * INTO account;
+
+    IF account.user_id IS NULL THEN
+        SELECT * INTO account FROM users WHERE email = p_email;
+    ELSE
+        is_new := TRUE;
+    END IF;
+
+    INSERT INTO creator_universe (user_id, overarching_goal, content_pillars)
+    VALUES (account.user_id, '', p_content_pillars)
+    ON CONFLICT (user_id) DO NOTHING;
+
+    INSERT INTO user_sessions (user_id, session_token, expires_at)
+    VALUES (account.user_id, p_session_token, p_expires_at)
+    ON CONFLICT (session_token) DO UPDATE
+    SET user_id = EXCLUDED.user_id, expires_at = EXCLUDED.expires_at, created_at = NOW();
+
+    DELETE FROM user_sessions s
+    WHERE s.user_id = account.user_id
+      AND s.session_token <> p_session_token
+      AND (
+          COALESCE(p_max_sessions, 0) <= 1
+          OR s.expires_at <= NOW()
+          OR s.id NOT IN (
+              SELECT k.id FROM user_sessions k
+              WHERE k.user_id = account.user_id
+              ORDER BY k.created_at DESC, k.id DESC
+              LIMIT p_max_sessions
+          )
+      );
+
+    RETURN QUERY SELECT to_jsonb(account), is_new;
+END;
+$$;
+
+-- ==================== CACHE INVALIDATION ====================
+-- Every write to a per-user table sends {table, user_id, ts} on the
+-- cache_invalidation channel at commit, so each backend worker LISTENing
+-- (invalidation.py) evicts what it cached for that user. ts is the
+-- transaction start, which keeps a transaction's repeated notifications
+-- identical (Postgres delivers them once) and makes the measured lag an
+-- upper bound.
+
+CREATE OR REPLACE FUNCTION notify_cache_invalidation()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    changed_user TEXT := CASE WHEN TG_OP = 'DELETE' THEN OLD.user_id ELSE NEW.user_id END;
+BEGIN
+    PERFORM pg_notify('cache_invalidation', json_build_object(
+        'table', TG_TABLE_NAME,
+        'user_id', changed_user,
+        'ts', extract(epoch FROM NOW())
+    )::text);
+    IF TG_OP = 'UPDATE' AND OLD.user_id IS DISTINCT FROM NEW.user_id THEN
+        PERFORM pg_notify('cache_invalidation', json_build_object(
+            'table', TG_TABLE_NAME,
+            'user_id', OLD.user_id,
+            'ts', extract(epoch FROM NOW())
+        )::text);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS users_notify ON users;
+CREATE TRIGGER users_notify AFTER INSERT OR UPDATE OR DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION notify_cache_invalidation();
+DROP TRIGGER IF EXISTS user_sessions_notify ON user_sessions;
+CREATE TRIGGER user_sessions_notify AFTER INSERT OR UPDATE OR DELETE ON user_sessions
+    FOR EACH ROW EXECUTE FUNCTION notify_cache_invalidation();
+DROP TRIGGER IF EXISTS missions_notify ON missions;
+CREATE TRIGGER missions_notify AFTER INSERT OR UPDATE OR DELETE ON missions
+    FOR EACH ROW EXECUTE FUNCTION notify_cache_invalidation();
+DROP TRIGGER IF EXISTS sos_completions_notify ON sos_completions;
+CREATE TRIGGER sos_completions_notify AFTER INSERT OR UPDATE OR DELETE ON sos_completions
+    FOR EACH ROW EXECUTE FUNCTION notify_cache_invalidation();
+DROP TRIGGER IF EXISTS creator_universe_notify ON creator_universe;
+CREATE TRIGGER creator_universe_notify AFTER INSERT OR UPDATE OR DELETE ON creator_universe
+    FOR EACH ROW EXECUTE FUNCTION notify_cache_invalidation();
+DROP TRIGGER IF EXISTS analysis_entries_notify ON analysis_entries;
+CREATE TRIGGER analysis_entries_notify AFTER INSERT OR UPDATE OR DELETE ON analysis_entries
+    FOR EACH ROW EXECUTE FUNCTION notify_cache_invalidation();
+DROP TRIGGER IF EXISTS schedule_notify ON schedule;
+CREATE TRIGGER schedule_notify AFTER INSERT OR UPDATE OR DELETE ON schedule
+    FOR EACH ROW EXECUTE FUNCTION notify_cache_invalidation();
+DROP TRIGGER IF EXISTS story_finder_notify ON story_finder;
+CREATE TRIGGER story_finder_notify AFTER INSERT OR UPDATE OR DELETE ON story_finder
+    FOR EACH ROW EXECUTE FUNCTION notify_cache_invalidation();
+DROP TRIGGER IF EXISTS content_tips_progress_notify ON content_tips_progress;
+CREATE TRIGGER content_tips_progress_notify AFTER INSERT OR UPDATE OR DELETE ON content_tips_progress
+    FOR EACH ROW EXECUTE FUNCTION notify_cache_invalidation();
+DROP TRIGGER IF EXISTS batching_scripts_notify ON batching_scripts;
+CREATE TRIGGER batching_scripts_notify AFTER INSERT OR UPDATE OR DELETE ON batching_scripts
+    FOR EACH ROW EXECUTE FUNCTION notify_cache_invalidation();
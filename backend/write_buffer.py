@@ -0,0 +1,171 @@
+"""
+Write-behind buffer for high-frequency autosave upserts.
+Holds the latest payload per (table, user_id, key) and flushes every window
+as one multi-row upsert per table, across all users.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BufferKey = Tuple[str, str, str]  # (table, user_id, row key)
+
+
+class WriteBuffer:
+    """Coalesces repeated upserts of the same row into the last one.
+
+    flush_fn(table, payloads) writes a batch. A batch rejected for its data
+    (is_row_error) is split per user, then per row, so one bad row cannot
+    take other rows down with it; whatever still fails is requeued (unless
+    a newer write replaced it) and dropped after max_attempts.
+    Rows stay readable via pending() until their flush has finished, and
+    stop() drains everything, so callers get read-your-writes and shutdown
+    loses nothing.
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[str, List[dict]], Awaitable[None]],
+        window: float,
+        max_pending: int = 5000,
+        batch_size: int = 500,
+        max_attempts: int = 3,
+        is_row_error: Callable[[Exception], bool] = lambda e: True,
+    ):
+        self.flush_fn = flush_fn
+        self.is_row_error = is_row_error
+        self.window = window
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        # key -> (payload, attempts)
+        self._pending: Dict[BufferKey, Tuple[dict, int]] = {}
+        self._flushing: Dict[BufferKey, Tuple[dict, int]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.writes = 0
+        self.coalesced = 0
+        self.flushed_rows = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+
+    def put(self, table: str, user_id: str, key: str, payload: dict):
+        """Queue payload as the row's next value, replacing any pending one."""
+        self.writes += 1
+        k = (table, user_id, key)
+        if self._pending.pop(k, None) is not None:
+            self.coalesced += 1
+        self._pending[k] = (payload, 0)
+        self._ensure_task()
+        if len(self._pending) >= self.max_pending and not self._flush_lock.locked():
+            asyncio.ensure_future(self.flush())
+
+    def pending(self, table: str, user_id: str) -> Dict[str, dict]:
+        """Unflushed payloads for the user's rows in table, by row key."""
+        out = {}
+        for source in (self._flushing, self._pending):
+            for (t, u, key), (payload, _) in source.items():
+                if t == table and u == user_id:
+                    out[key] = payload
+        return out
+
+    async def discard(self, table: str, user_id: str, keys: Optional[List[str]] = None):
+        """Drop pending writes (all of the user's rows in table when keys is None).
+
+        Waits for an in-progress flush touching those rows, so a delete issued
+        after this returns cannot be overtaken by the buffered upsert.
+        """
+        def matches(k: BufferKey) -> bool:
+            return k[0] == table and k[1] == user_id and (keys is None or k[2] in keys)
+
+        for k in [k for k in self._pending if matches(k)]:
+            del self._pending[k]
+        if any(matches(k) for k in self._flushing):
+            async with self._flush_lock:
+                pass
+
+    async def flush(self):
+        """Write everything pending now."""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            self._flushing, self._pending = self._pending, {}
+            by_table: Dict[str, List[BufferKey]] = {}
+            for k in self._flushing:
+                by_table.setdefault(k[0], []).append(k)
+            try:
+                for table, keys in by_table.items():
+                    for i in range(0, len(keys), self.batch_size):
+                        await self._write(table, keys[i:i + self.batch_size])
+                self.flushes += 1
+            finally:
+                self._flushing = {}
+
+    async def _write(self, table: str, keys: List[BufferKey]):
+        try:
+            await self.flush_fn(table, [self._flushing[k][0] for k in keys])
+            self.flushed_rows += len(keys)
+        except Exception as e:
+            self.failed_flushes += 1
+            logger.error(f"Write buffer flush of {len(keys)} {table} rows failed: {e}")
+            if len(keys) == 1 or not self.is_row_error(e):
+                self._requeue(keys)
+                return
+            # Narrow down to the rows at fault: per user first, then per row
+            by_user: Dict[str, List[BufferKey]] = {}
+            for k in keys:
+                by_user.setdefault(k[1], []).append(k)
+            parts = list(by_user.values()) if len(by_user) > 1 else [[k] for k in keys]
+            for part in parts:
+                await self._write(table, part)
+
+    def _requeue(self, keys: List[BufferKey]):
+        for k in keys:
+            payload, attempts = self._flushing[k]
+            if k in self._pending:
+                continue  # superseded by a newer write
+            if attempts + 1 >= self.max_attempts:
+                self.dropped += 1
+                logger.error(f"Dropping buffered write to {k[0]} for {k[1]}/{k[2]} after {attempts + 1} attempts")
+                continue
+            self._pending[k] = (payload, attempts + 1)
+
+    def _ensure_task(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.window)
+            await self.flush()
+
+    async def stop(self):
+        """Cancel the flush loop and drain what is still pending."""
+        if self._task is not None:
+            # Only cancel between flushes, never halfway through writing a batch
+            async with self._flush_lock:
+                self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for _ in range(self.max_attempts):
+            if not self._pending:
+                break
+            await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": round(self.window * 1000),
+            "pending": len(self._pending),
+            "flushing": len(self._flushing),
+            "writes": self.writes,
+            "coalesced": self.coalesced,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "failed_flushes": self.failed_flushes,
+            "dropped": self.dropped,
+        }
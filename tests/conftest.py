@@ -0,0 +1,23 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# The backend is a flat module layout run from backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+# db.py refuses to import without these; tests never reach the network
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "test-service-key")
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    """db.py talking to an in-memory FakeDB instead of PostgREST"""
+    import db
+    from tests.fakes import NOW, FakeDB
+
+    fake = FakeDB(NOW)
+    monkeypatch.setattr(db, "_db_client", fake)
+    return fake
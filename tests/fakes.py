@@ -0,0 +1,62 @@
+"""Test doubles shared by the db-level tests."""
+from datetime import datetime, timezone
+
+# Database clock of FakeDB unless a test moves it
+NOW = datetime(2026, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _comparable(value):
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return value
+    return value
+
+
+class FakeDB:
+    """In-memory stand-in for the query transport (the subset db.py uses here)."""
+
+    OPS = {
+        "eq": lambda a, b: a == b,
+        "lt": lambda a, b: _comparable(a) < _comparable(b),
+        "gt": lambda a, b: _comparable(a) > _comparable(b),
+        "in": lambda a, b: a in b,
+    }
+
+    def __init__(self, now):
+        self.now = now
+        self.tables = {}
+        self.upserts = []
+
+    def _match(self, table, eq, filters):
+        conds = [(k, "eq", v) for k, v in (eq or {}).items()] + list(filters)
+        return [r for r in self.tables.get(table, []) if all(self.OPS[op](r.get(c), v) for c, op, v in conds)]
+
+    async def select(self, table, columns="*", eq=None, filters=(), order=(), limit=None, or_=None):
+        rows = [dict(r) for r in self._match(table, eq, filters)]
+        for col, desc in reversed(order):
+            rows.sort(key=lambda r: _comparable(r[col]), reverse=desc)
+        return rows[:limit] if limit is not None else rows
+
+    async def upsert(self, table, data, on_conflict):
+        payloads = data if isinstance(data, list) else [data]
+        self.upserts.append((table, payloads))
+        keys = on_conflict.split(",")
+        rows = self.tables.setdefault(table, [])
+        for payload in payloads:
+            existing = next((r for r in rows if all(r.get(k) == payload[k] for k in keys)), None)
+            if existing is None:
+                rows.append({"id": len(rows) + 1, "updated_at": self.now.isoformat(), **payload})
+            else:
+                existing.update(payload, updated_at=self.now.isoformat())
+        return payloads
+
+    async def delete(self, table, eq=None, filters=()):
+        doomed = self._match(table, eq, filters)
+        self.tables[table] = [r for r in self.tables.get(table, []) if r not in doomed]
+        return doomed
+
+    async def rpc(self, fn, params):
+        assert fn == "sync_clock"
+        return self.now.isoformat()
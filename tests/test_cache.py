@@ -0,0 +1,61 @@
+from cache import TTLCache
+
+
+def test_load_is_stored_when_nothing_was_invalidated():
+    cache = TTLCache()
+    with cache.loading() as load:
+        load.set("token", "session", tags=["user:u1"])
+    assert cache.get("token") == "session"
+
+
+def test_load_racing_an_invalidation_of_its_tag_is_not_stored():
+    cache = TTLCache()
+    with cache.loading() as load:
+        cache.invalidate_tag("user:u1")  # e.g. logout while the session was being read
+        load.set("token", "dead session", tags=["user:u1"])
+    assert cache.get("token") is None
+    assert cache.stats()["skipped_stores"] == 1
+
+
+def test_load_racing_a_clear_is_not_stored():
+    cache = TTLCache()
+    with cache.loading() as load:
+        cache.clear()
+        load.set("token", "session", tags=["user:u1"])
+    assert cache.get("token") is None
+
+
+def test_invalidations_of_other_tags_or_before_the_load_do_not_block_it():
+    cache = TTLCache()
+    with cache.loading() as other:
+        cache.invalidate_tag("user:u1")
+        with cache.loading() as load:
+            cache.invalidate_tag("user:u2")
+            load.set("token", "session", tags=["user:u1"])
+        other.set("other", "value", tags=["user:u3"])
+    assert cache.get("token") == "session"
+    assert cache.get("other") == "value"
+
+
+def test_invalidation_bookkeeping_is_dropped_when_no_load_is_in_flight():
+    cache = TTLCache()
+    with cache.loading():
+        for i in range(5):
+            cache.invalidate_tag(f"user:{i}")
+    cache.invalidate_tag("user:later")
+    assert cache._invalidated_at == {}
+    assert not cache._load_starts
+
+
+def test_disabled_cache_misses_and_drops_stores():
+    live = {"on": False}
+    cache = TTLCache(enabled=lambda: live["on"])
+    cache.set("token", "session")
+    with cache.loading() as load:
+        load.set("other", "value")
+    assert cache.get("token") is None
+    live["on"] = True
+    assert cache.get("token") is None and cache.get("other") is None
+    cache.set("token", "session")
+    assert cache.get("token") == "session"
+    assert cache.stats()["bypassed"] == 1
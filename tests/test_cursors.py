@@ -0,0 +1,51 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+import db
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_cursor_round_trips():
+    values = ["2026-06-01T12:00:00+00:00", 42]
+    assert db.decode_cursor(db.encode_cursor(values), [datetime, int]) == values
+
+
+@pytest.mark.parametrize("values, kinds", [
+    (["x"], [int]),
+    ([True], [int]),
+    ([1.5], [int]),
+    ([1, 2], [int]),
+    (["yesterday", 1], [datetime, int]),
+    ([1700000000, 1], [datetime, int]),
+    (["2026-06-01T12:00:00+00:00", "1"], [datetime, int]),
+])
+def test_cursor_with_wrong_shape_or_types_is_rejected(values, kinds):
+    with pytest.raises(db.InvalidCursor):
+        db.decode_cursor(db.encode_cursor(values), kinds)
+
+
+@pytest.mark.parametrize("cursor", ["%%%", "bm90IGpzb24", db.encode_cursor({"id": 1})])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(db.InvalidCursor):
+        db.decode_cursor(cursor, [int])
+
+
+def test_keyset_pages_walk_every_row_once(fake):
+    fake.tables["analysis_entries"] = [
+        {"id": i, "user_id": "u1", "entry_id": f"e{i}", "data": {"n": i}} for i in range(1, 6)
+    ]
+
+    async def walk():
+        seen, cursor = [], None
+        while True:
+            entries, cursor = await db.analysis_page("u1", limit=2, cursor=cursor)
+            seen.extend(e["id"] for e in entries)
+            if cursor is None:
+                return seen
+
+    assert run(walk()) == ["e5", "e4", "e3", "e2", "e1"]
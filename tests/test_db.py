@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+import db
+from write_buffer import WriteBuffer
+
+
+@pytest.fixture
+def buffered(fake, monkeypatch):
+    buf = WriteBuffer(db._flush_buffered, window=60)
+    monkeypatch.setattr(db, "write_buffer", buf)
+    return buf
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_buffered_upsert_is_visible_before_it_is_flushed(fake, buffered):
+    fake.tables["analysis_entries"] = [{"id": 1, "user_id": "u1", "entry_id": "e1", "data": {"v": "old"}}]
+
+    async def scenario():
+        await db.analysis_upsert("u1", "e1", {"v": "new"})
+        await db.analysis_upsert("u1", "e2", {"v": "fresh"})
+        entries, _ = await db.analysis_page("u1")
+        await buffered.stop()
+        return entries
+
+    entries = run(scenario())
+    assert entries == [{"id": "e2", "v": "fresh"}, {"id": "e1", "v": "new"}]
+    assert [p["entry_id"] for p in fake.upserts[-1][1]] == ["e1", "e2"]
+
+
+def test_buffered_update_of_a_row_on_a_later_page_is_not_prepended(fake, buffered):
+    fake.tables["analysis_entries"] = [
+        {"id": i, "user_id": "u1", "entry_id": f"e{i}", "data": {"v": i}} for i in range(1, 4)
+    ]
+
+    async def scenario():
+        await db.analysis_upsert("u1", "e1", {"v": "edited"})
+        first, cursor = await db.analysis_page("u1", limit=2)
+        second, _ = await db.analysis_page("u1", limit=2, cursor=cursor)
+        await buffered.stop()
+        return first, second
+
+    first, second = run(scenario())
+    assert [e["id"] for e in first] == ["e3", "e2"]
+    assert second == [{"id": "e1", "v": "edited"}]
+
+
+def test_delete_discards_the_buffered_upsert(fake, buffered):
+    async def scenario():
+        await db.analysis_upsert("u1", "e1", {"v": 1})
+        existed = await db.analysis_delete("u1", "e1")
+        await buffered.stop()
+        entries, _ = await db.analysis_page("u1")
+        return existed, entries
+
+    existed, entries = run(scenario())
+    assert existed is True
+    assert entries == []
+    assert fake.upserts == []
+
+
+def test_unbuffered_upsert_lands_now_and_drops_the_older_buffered_write(fake, buffered):
+    async def scenario():
+        await db.analysis_upsert("u1", "e1", {"v": "buffered"})
+        await db.analysis_upsert_many("u1", [("e1", {"v": "direct"})], buffered=False)
+        landed = [p["data"] for _, payloads in fake.upserts for p in payloads]
+        await buffered.stop()
+        return landed
+
+    assert run(scenario()) == [{"v": "direct"}]
+    assert buffered.pending("analysis_entries", "u1") == {}
+    assert len(fake.upserts) == 1
@@ -0,0 +1,119 @@
+import asyncio
+
+from cache import TTLCache
+from response_cache import ResponseCache
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def make_cache():
+    return ResponseCache(TTLCache(max_entries=100, ttl=60))
+
+
+class Loader:
+    def __init__(self, value, gate=None):
+        self.value = value
+        self.gate = gate
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        return self.value
+
+
+def test_second_read_is_served_from_cache():
+    cache = make_cache()
+    load = Loader({"rows": []})
+
+    async def scenario():
+        await cache.get_or_load("u1", "schedule", None, load)
+        return await cache.get_or_load("u1", "schedule", None, load)
+
+    assert run(scenario()) == {"rows": []}
+    assert load.calls == 1
+
+
+def test_none_results_are_cached():
+    cache = make_cache()
+    load = Loader(None)
+
+    async def scenario():
+        first = await cache.get_or_load("u1", "story_finder", None, load)
+        second = await cache.get_or_load("u1", "story_finder", None, load)
+        return first, second
+
+    assert run(scenario()) == (None, None)
+    assert load.calls == 1
+
+
+def test_load_racing_an_invalidation_of_its_section_is_not_stored():
+    cache = make_cache()
+
+    async def scenario():
+        gate = asyncio.Event()
+        racing = asyncio.create_task(cache.get_or_load("u1", "schedule", None, Loader("old", gate)))
+        await asyncio.sleep(0)
+        cache.invalidate("u1", "schedule")
+        gate.set()
+        await racing
+        return await cache.get_or_load("u1", "schedule", None, Loader("new"))
+
+    assert run(scenario()) == "new"
+    assert cache.skipped_stores == 1
+
+
+def test_invalidations_of_other_users_or_sections_do_not_block_stores():
+    cache = make_cache()
+
+    async def scenario():
+        gate = asyncio.Event()
+        loads = [
+            asyncio.create_task(cache.get_or_load(user, "schedule", None, Loader(user, gate)))
+            for user in ("u1", "u2", "u3")
+        ]
+        await asyncio.sleep(0)
+        cache.invalidate("u9", "schedule")
+        cache.invalidate("u1", "analysis")
+        gate.set()
+        await asyncio.gather(*loads)
+
+    run(scenario())
+    assert cache.skipped_stores == 0
+    assert cache.stats()["size"] == 3
+
+
+def test_invalidating_all_sections_blocks_the_users_in_flight_loads():
+    cache = make_cache()
+
+    async def scenario():
+        gate = asyncio.Event()
+        racing = asyncio.create_task(cache.get_or_load("u1", "analysis", None, Loader("old", gate)))
+        await asyncio.sleep(0)
+        cache.invalidate("u1")
+        gate.set()
+        await racing
+
+    run(scenario())
+    assert cache.skipped_stores == 1
+    assert cache._loading == {} and cache._generations == {}
+
+
+def test_invalidate_evicts_only_the_named_section():
+    cache = make_cache()
+
+    async def scenario():
+        await cache.get_or_load("u1", "schedule", None, Loader("s"))
+        await cache.get_or_load("u1", "analysis", None, Loader("a"))
+        cache.invalidate("u1", "schedule")
+        schedule = Loader("s2")
+        analysis = Loader("a2")
+        return (
+            await cache.get_or_load("u1", "schedule", None, schedule),
+            await cache.get_or_load("u1", "analysis", None, analysis),
+        )
+
+    assert run(scenario()) == ("s2", "a")
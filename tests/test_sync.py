@@ -0,0 +1,78 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+import db
+from tests.fakes import NOW
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+SYNC_TABLES = ("analysis_entries", "batching_scripts", "content_tips_progress",
+               "creator_universe", "schedule", "story_finder")
+
+
+def _empty_sync_tables(fake):
+    for table in SYNC_TABLES + ("sync_tombstones",):
+        fake.tables.setdefault(table, [])
+
+
+def test_steady_state_sync_of_long_unchanged_data_does_not_reset(fake):
+    _empty_sync_tables(fake)
+    old = (NOW - timedelta(days=90)).isoformat()
+    fake.tables["analysis_entries"] = [{"user_id": "u1", "entry_id": "e1", "data": {}, "updated_at": old}]
+
+    async def scenario():
+        first = await db.sync_changes("u1", None)
+        fake.now = NOW + timedelta(minutes=5)
+        second = await db.sync_changes("u1", first["next_token"])
+        return first, second
+
+    first, second = run(scenario())
+    assert first["reset"] is True
+    assert first["changes"]["analysis_entries"]["upserts"] == [{"id": "e1"}]
+    assert second["reset"] is False
+    assert second["changes"]["analysis_entries"] == {"upserts": [], "deletes": []}
+    assert second["next_token"] != first["next_token"]
+
+
+def test_sync_of_a_user_without_rows_does_not_reset(fake):
+    _empty_sync_tables(fake)
+
+    async def scenario():
+        first = await db.sync_changes("u1", None)
+        return await db.sync_changes("u1", first["next_token"])
+
+    assert run(scenario())["reset"] is False
+
+
+def test_token_older_than_tombstone_retention_resets(fake):
+    _empty_sync_tables(fake)
+    stale = db.encode_cursor([(NOW - timedelta(days=db.SYNC_TOMBSTONE_RETENTION_DAYS)).isoformat()])
+    assert run(db.sync_changes("u1", stale))["reset"] is True
+
+
+def test_sync_reports_changes_and_document_deletes_since_token(fake):
+    _empty_sync_tables(fake)
+    token = db.encode_cursor([(NOW - timedelta(hours=1)).isoformat()])
+    fake.tables["batching_scripts"] = [
+        {"user_id": "u1", "script_id": "s1", "data": {"t": 1}, "updated_at": NOW.isoformat()},
+        {"user_id": "u1", "script_id": "s0", "data": {}, "updated_at": (NOW - timedelta(days=2)).isoformat()},
+    ]
+    fake.tables["sync_tombstones"] = [
+        {"user_id": "u1", "table_name": "schedule", "row_key": "u1", "deleted_at": NOW.isoformat()},
+        {"user_id": "u1", "table_name": "batching_scripts", "row_key": "s9", "deleted_at": NOW.isoformat()},
+    ]
+
+    result = run(db.sync_changes("u1", token))
+    assert result["reset"] is False
+    assert result["changes"]["batching_scripts"] == {"upserts": [{"id": "s1", "t": 1}], "deletes": ["s9"]}
+    assert result["changes"]["schedule"] == {"upserts": [], "deletes": ["u1"]}
+
+
+def test_malformed_sync_token_is_rejected(fake):
+    with pytest.raises(db.InvalidCursor):
+        run(db.sync_changes("u1", db.encode_cursor(["not a time"])))
@@ -0,0 +1,239 @@
+import asyncio
+
+from write_buffer import WriteBuffer
+
+
+class Sink:
+    """flush_fn that records batches and can fail or block on demand."""
+
+    def __init__(self):
+        self.batches = []
+        self.failures = 0
+        self.gate = None
+
+    async def __call__(self, table, payloads):
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("write failed")
+        if any(p.get("bad") for p in payloads):
+            raise ValueError("row rejected")
+        self.batches.append((table, [dict(p) for p in payloads]))
+
+    def rows(self):
+        return [p for _, payloads in self.batches for p in payloads]
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_repeated_writes_to_a_row_coalesce_into_the_last():
+    async def scenario():
+        sink = Sink()
+        buf = WriteBuffer(sink, window=60)
+        buf.put("analysis_entries", "u1", "e1", {"v": 1})
+        buf.put("analysis_entries", "u1", "e1", {"v": 2})
+        buf.put("analysis_entries", "u1", "e2", {"v": 3})
+        await buf.flush()
+        await buf.stop()
+        return sink, buf
+
+    sink, buf = run(scenario())
+    assert sink.batches == [("analysis_entries", [{"v": 2}, {"v": 3}])]
+    assert buf.stats()["coalesced"] == 1
+    assert buf.stats()["flushed_rows"] == 2
+
+
+def test_flush_batches_per_table_and_by_batch_size():
+    async def scenario():
+        sink = Sink()
+        buf = WriteBuffer(sink, window=60, batch_size=2)
+        for i in range(3):
+            buf.put("analysis_entries", "u1", f"e{i}", {"i": i})
+        buf.put("batching_scripts", "u1", "s1", {"s": 1})
+        await buf.stop()
+        return sink
+
+    sink = run(scenario())
+    assert [(t, len(p)) for t, p in sink.batches] == [
+        ("analysis_entries", 2), ("analysis_entries", 1), ("batching_scripts", 1),
+    ]
+
+
+def test_pending_is_readable_until_the_flush_finishes():
+    async def scenario():
+        sink = Sink()
+        sink.gate = asyncio.Event()
+        buf = WriteBuffer(sink, window=60)
+        buf.put("analysis_entries", "u1", "e1", {"v": 1})
+        buf.put("analysis_entries", "u2", "e1", {"v": 9})
+        flush = asyncio.create_task(buf.flush())
+        await asyncio.sleep(0)
+        during = buf.pending("analysis_entries", "u1")
+        sink.gate.set()
+        await flush
+        after = buf.pending("analysis_entries", "u1")
+        await buf.stop()
+        return during, after
+
+    during, after = run(scenario())
+    assert during == {"e1": {"v": 1}}
+    assert after == {}
+
+
+def test_failed_batch_is_requeued_then_dropped_after_max_attempts():
+    async def scenario():
+        sink = Sink()
+        sink.failures = 10
+        buf = WriteBuffer(sink, window=60, max_attempts=2)
+        buf.put("analysis_entries", "u1", "e1", {"v": 1})
+        await buf.flush()
+        requeued = buf.pending("analysis_entries", "u1")
+        await buf.flush()
+        return sink, buf, requeued
+
+    sink, buf, requeued = run(scenario())
+    assert requeued == {"e1": {"v": 1}}
+    assert buf.pending("analysis_entries", "u1") == {}
+    assert buf.stats()["failed_flushes"] == 2
+    assert buf.stats()["dropped"] == 1
+    assert sink.rows() == []
+
+
+def test_rejected_batch_is_split_so_only_the_bad_row_is_requeued():
+    async def scenario():
+        sink = Sink()
+        buf = WriteBuffer(sink, window=60)
+        buf.put("analysis_entries", "u1", "e1", {"v": 1})
+        buf.put("analysis_entries", "u1", "e2", {"v": 2, "bad": True})
+        buf.put("analysis_entries", "u2", "e1", {"v": 3})
+        await buf.flush()
+        return sink, buf
+
+    sink, buf = run(scenario())
+    assert sorted(p["v"] for p in sink.rows()) == [1, 3]
+    assert buf.pending("analysis_entries", "u1") == {"e2": {"v": 2, "bad": True}}
+    assert buf.pending("analysis_entries", "u2") == {}
+
+
+def test_batch_failing_for_other_reasons_is_requeued_whole():
+    async def scenario():
+        sink = Sink()
+        sink.failures = 1
+        buf = WriteBuffer(sink, window=60, is_row_error=lambda e: not isinstance(e, RuntimeError))
+        buf.put("analysis_entries", "u1", "e1", {"v": 1})
+        buf.put("analysis_entries", "u2", "e1", {"v": 2})
+        await buf.flush()
+        requeued = [buf.pending("analysis_entries", u) for u in ("u1", "u2")]
+        await buf.stop()
+        return sink, buf, requeued
+
+    sink, buf, requeued = run(scenario())
+    assert requeued == [{"e1": {"v": 1}}, {"e1": {"v": 2}}]
+    assert buf.stats()["failed_flushes"] == 1
+    assert sink.batches == [("analysis_entries", [{"v": 1}, {"v": 2}])]
+
+
+def test_failed_batch_does_not_overwrite_a_newer_write():
+    async def scenario():
+        sink = Sink()
+        sink.gate = asyncio.Event()
+        sink.failures = 1
+        buf = WriteBuffer(sink, window=60)
+        buf.put("analysis_entries", "u1", "e1", {"v": 1})
+        flush = asyncio.create_task(buf.flush())
+        await asyncio.sleep(0)
+        buf.put("analysis_entries", "u1", "e1", {"v": 2})
+        sink.gate.set()
+        await flush
+        await buf.stop()
+        return sink
+
+    sink = run(scenario())
+    assert sink.rows() == [{"v": 2}]
+
+
+def test_discard_drops_pending_rows():
+    async def scenario():
+        sink = Sink()
+        buf = WriteBuffer(sink, window=60)
+        buf.put("analysis_entries", "u1", "e1", {"v": 1})
+        buf.put("analysis_entries", "u1", "e2", {"v": 2})
+        buf.put("analysis_entries", "u2", "e1", {"v": 3})
+        await buf.discard("analysis_entries", "u1", ["e1"])
+        await buf.stop()
+        return sink
+
+    sink = run(scenario())
+    assert sink.rows() == [{"v": 2}, {"v": 3}]
+
+
+def test_discard_waits_for_an_in_flight_flush_of_the_row():
+    """A delete issued after discard() returns can never be overtaken by the upsert."""
+    async def scenario():
+        order = []
+        sink = Sink()
+        sink.gate = asyncio.Event()
+        buf = WriteBuffer(sink, window=60)
+        buf.put("analysis_entries", "u1", "e1", {"v": 1})
+        flush = asyncio.create_task(buf.flush())
+        await asyncio.sleep(0)
+
+        async def delete():
+            await buf.discard("analysis_entries", "u1", ["e1"])
+            order.append("delete")
+
+        deleting = asyncio.create_task(delete())
+        await asyncio.sleep(0)
+        order.append("flush released")
+        sink.gate.set()
+        await asyncio.gather(flush, deleting)
+        await buf.stop()
+        return order, sink
+
+    order, sink = run(scenario())
+    assert order == ["flush released", "delete"]
+    assert sink.rows() == [{"v": 1}]
+
+
+def test_stop_drains_pending_writes_and_cancels_the_loop():
+    async def scenario():
+        sink = Sink()
+        buf = WriteBuffer(sink, window=60)
+        buf.put("analysis_entries", "u1", "e1", {"v": 1})
+        task = buf._task
+        await buf.stop()
+        return sink, buf, task
+
+    sink, buf, task = run(scenario())
+    assert sink.rows() == [{"v": 1}]
+    assert task.cancelled()
+    assert buf.stats()["pending"] == 0
+
+
+def test_stop_retries_a_failed_drain():
+    async def scenario():
+        sink = Sink()
+        sink.failures = 1
+        buf = WriteBuffer(sink, window=60, max_attempts=3)
+        buf.put("analysis_entries", "u1", "e1", {"v": 1})
+        await buf.stop()
+        return sink
+
+    sink = run(scenario())
+    assert sink.rows() == [{"v": 1}]
+
+
+def test_flush_loop_writes_every_window():
+    async def scenario():
+        sink = Sink()
+        buf = WriteBuffer(sink, window=0.01)
+        buf.put("analysis_entries", "u1", "e1", {"v": 1})
+        await asyncio.sleep(0.05)
+        flushed = sink.rows()
+        await buf.stop()
+        return flushed
+
+    assert run(scenario()) == [{"v": 1}]